@@ -1,560 +1,2259 @@
-from flask import Flask, request, jsonify
-from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
-import os
-from werkzeug.security import generate_password_hash, check_password_hash
-import jwt
-from functools import wraps, reduce
-import logging
-import random
-import string
-from collections import defaultdict
-
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///attendance.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SECRET_KEY'] = os.urandom(24).hex()
-db = SQLAlchemy(app)
-
-logging.basicConfig(level=logging.INFO)
-
-# Models
-class User(db.Model):
-    """User model representing teachers or admins."""
-    id = db.Column(db.Integer, primary_key=True)
-    type = db.Column(db.String(20), nullable=False)
-    full_name = db.Column(db.String(100), nullable=False)
-    username = db.Column(db.String(50), unique=True, nullable=False)
-    email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
-    submitted_by = db.Column(db.Integer, db.ForeignKey('user.id'))
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    submitter = db.relationship('User', remote_side=[id], backref='submitted_users')
-
-class Department(db.Model):
-    """Department model."""
-    id = db.Column(db.Integer, primary_key=True)
-    department_name = db.Column(db.String(100), nullable=False)
-    submitted_by = db.Column(db.Integer, db.ForeignKey('user.id'))
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-
-class Course(db.Model):
-    """Course model."""
-    id = db.Column(db.Integer, primary_key=True)
-    course_name = db.Column(db.String(100), nullable=False)
-    department_id = db.Column(db.Integer, db.ForeignKey('department.id'), nullable=False)
-    semester = db.Column(db.String(20))
-    class_hours = db.Column(db.Integer)
-    lecture_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    submitted_by = db.Column(db.Integer, db.ForeignKey('user.id'))
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-
-class Student(db.Model):
-    """Student model."""
-    id = db.Column(db.Integer, primary_key=True)
-    full_name = db.Column(db.String(100), nullable=False)
-    department_id = db.Column(db.Integer, db.ForeignKey('department.id'), nullable=False)
-    class_ = db.Column(db.String(50))
-    submitted_by = db.Column(db.Integer, db.ForeignKey('user.id'))
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-
-class AttendanceLog(db.Model):
-    """AttendanceLog model."""
-    id = db.Column(db.Integer, primary_key=True)
-    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), nullable=False)
-    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
-    present = db.Column(db.Boolean, nullable=False)
-    submitted_by = db.Column(db.Integer, db.ForeignKey('user.id'))
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    student = db.relationship('Student', backref='attendance_logs', lazy=True)
-    course = db.relationship('Course', backref='attendance_logs', lazy=True)
-
-# Create database and first user
-with app.app_context():
-    db.drop_all()
-    db.create_all()
-    if User.query.count() == 0:
-        password = ''.join(random.choices(string.ascii_letters + string.digits, k=12))
-        admin = User(
-            type='admin',
-            full_name='Admin User',
-            username='admin',
-            email='admin@gmail.com',
-            password_hash=generate_password_hash(password),
-            updated_at=datetime.utcnow()
-        )
-        db.session.add(admin)
-        try:
-            db.session.commit()
-            logging.info(f'First user created: username=admin, password={password}')
-        except Exception as e:
-            db.session.rollback()
-            logging.error(f'Error creating first user: {str(e)}')
-
-# Helper function to validate date
-def validate_date(date_text):
-    """Validate date string in YYYY-MM-DD format."""
-    try:
-        datetime.strptime(date_text, '%Y-%m-%d')
-        return True
-    except ValueError:
-        return False
-
-# Token required decorator
-def token_required(f):
-    """Decorator to ensure API is protected by JWT token."""
-    @wraps(f)
-    def decorator(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({'error': 'Token missing'}), 401
-        try:
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-            current_user = User.query.get(data['id'])
-            if not current_user:
-                return jsonify({'error': 'User not found'}), 401
-        except Exception as e:
-            logging.error(f'Invalid token: {str(e)}')
-            return jsonify({'error': 'Invalid token'}), 401
-        return f(current_user, *args, **kwargs)
-    return decorator
-
-# Login
-@app.route('/api/login', methods=['POST'])
-def login():
-    """Login API to generate JWT token."""
-    data = request.get_json()
-    if not data or 'username' not in data or 'password' not in data:
-        return jsonify({'error': 'Missing username or password'}), 400
-    user = User.query.filter_by(username=data['username']).first()
-    if not user or not check_password_hash(user.password_hash, data['password']):
-        return jsonify({'error': 'Invalid credentials'}), 401
-    token = jwt.encode({'id': user.id}, app.config['SECRET_KEY'], algorithm='HS256')
-    return jsonify({'token': token}), 200
-
-# User APIs
-@app.route('/api/users', methods=['POST'])
-@token_required
-def create_user(current_user):
-    """Create a new user."""
-    data = request.get_json()
-    required_fields = ['type', 'full_name', 'username', 'email', 'password']
-    if not data or not all(key in data for key in required_fields):
-        return jsonify({'error': 'Missing required fields'}), 400
-    if User.query.filter_by(username=data['username']).first():
-        return jsonify({'error': 'Username already exists'}), 400
-    if User.query.filter_by(email=data['email']).first():
-        return jsonify({'error': 'Email already exists'}), 400
-    user = User(
-        type=data['type'],
-        full_name=data['full_name'],
-        username=data['username'],
-        email=data['email'],
-        password_hash=generate_password_hash(data['password']),
-        submitted_by=current_user.id,
-        updated_at=datetime.utcnow()
-    )
-    db.session.add(user)
-    try:
-        db.session.commit()
-        return jsonify({
-            'id': user.id,
-            'type': user.type,
-            'full_name': user.full_name,
-            'username': user.username,
-            'email': user.email
-        }), 201
-    except Exception as e:
-        db.session.rollback()
-        logging.error(f'Error creating user: {str(e)}')
-        return jsonify({'error': 'Database error'}), 500
-
-@app.route('/api/users', methods=['GET'])
-@token_required
-def get_users(current_user):
-    """Get all users."""
-    users = User.query.all()
-    return jsonify([{
-        'id': u.id,
-        'type': u.type,
-        'full_name': u.full_name,
-        'username': u.username,
-        'email': u.email
-    } for u in users]), 200
-
-@app.route('/api/users/<int:user_id>', methods=['GET'])
-@token_required
-def get_user(current_user, user_id):
-    """Get a specific user by ID."""
-    user = User.query.get(user_id)
-    if not user:
-        return jsonify({'error': 'User not found'}), 404
-    return jsonify({
-        'id': user.id,
-        'type': user.type,
-        'full_name': user.full_name,
-        'username': user.username,
-        'email': user.email
-    }), 200
-
-@app.route('/api/users/<int:user_id>', methods=['PUT'])
-@token_required
-def update_user(current_user, user_id):
-    """Update a user."""
-    user = User.query.get(user_id)
-    if not user:
-        return jsonify({'error': 'User not found'}), 404
-    data = request.get_json()
-    if 'full_name' in data:
-        user.full_name = data['full_name']
-    if 'email' in data:
-        if User.query.filter_by(email=data['email']).first() and user.email != data['email']:
-            return jsonify({'error': 'Email already exists'}), 400
-        user.email = data['email']
-    if 'password' in data:
-        user.password_hash = generate_password_hash(data['password'])
-    if 'type' in data:
-        user.type = data['type']
-    user.updated_at = datetime.utcnow()
-    try:
-        db.session.commit()
-        return jsonify({'message': 'User updated'}), 200
-    except Exception as e:
-        db.session.rollback()
-        logging.error(f'Error updating user: {str(e)}')
-        return jsonify({'error': 'Database error'}), 500
-
-# Department APIs
-@app.route('/api/departments', methods=['POST'])
-@token_required
-def create_department(current_user):
-    """Create a new department."""
-    data = request.get_json()
-    if not data or 'department_name' not in data:
-        return jsonify({'error': 'Missing department_name'}), 400
-    dept = Department(
-        department_name=data['department_name'],
-        submitted_by=current_user.id,
-        updated_at=datetime.utcnow()
-    )
-    db.session.add(dept)
-    try:
-        db.session.commit()
-        return jsonify({
-            'id': dept.id,
-            'department_name': dept.department_name
-        }), 201
-    except Exception as e:
-        db.session.rollback()
-        logging.error(f'Error creating department: {str(e)}')
-        return jsonify({'error': 'Database error'}), 500
-
-@app.route('/api/departments', methods=['GET'])
-@token_required
-def get_departments(current_user):
-    """Get all departments."""
-    depts = Department.query.all()
-    return jsonify([{
-        'id': d.id,
-        'department_name': d.department_name
-    } for d in depts]), 200
-
-@app.route('/api/departments/<int:dept_id>', methods=['GET'])
-@token_required
-def get_department(current_user, dept_id):
-    """Get a specific department by ID."""
-    dept = Department.query.get(dept_id)
-    if not dept:
-        return jsonify({'error': 'Department not found'}), 404
-    return jsonify({
-        'id': dept.id,
-        'department_name': dept.department_name
-    }), 200
-
-@app.route('/api/departments/<int:dept_id>', methods=['PUT'])
-@token_required
-def update_department(current_user, dept_id):
-    """Update a department."""
-    dept = Department.query.get(dept_id)
-    if not dept:
-        return jsonify({'error': 'Department not found'}), 404
-    data = request.get_json()
-    if 'department_name' in data:
-        dept.department_name = data['department_name']
-    dept.updated_at = datetime.utcnow()
-    try:
-        db.session.commit()
-        return jsonify({'message': 'Department updated'}), 200
-    except Exception as e:
-        db.session.rollback()
-        logging.error(f'Error updating department: {str(e)}')
-        return jsonify({'error': 'Database error'}), 500
-
-# Course APIs
-@app.route('/api/courses', methods=['POST'])
-@token_required
-def create_course(current_user):
-    """Create a new course."""
-    data = request.get_json()
-    required_fields = ['course_name', 'department_id']
-    if not data or not all(key in data for key in required_fields):
-        return jsonify({'error': 'Missing required fields'}), 400
-    if not Department.query.get(data['department_id']):
-        return jsonify({'error': 'Department not found'}), 404
-    if 'lecture_id' in data and not User.query.get(data['lecture_id']):
-        return jsonify({'error': 'Lecture not found'}), 404
-    course = Course(
-        course_name=data['course_name'],
-        department_id=data['department_id'],
-        semester=data.get('semester'),
-        class_hours=data.get('class_hours'),
-        lecture_id=data.get('lecture_id'),
-        submitted_by=current_user.id,
-        updated_at=datetime.utcnow()
-    )
-    db.session.add(course)
-    try:
-        db.session.commit()
-        return jsonify({
-            'id': course.id,
-            'course_name': course.course_name,
-            'department_id': course.department_id,
-            'semester': course.semester,
-            'class_hours': course.class_hours,
-            'lecture_id': course.lecture_id
-        }), 201
-    except Exception as e:
-        db.session.rollback()
-        logging.error(f'Error creating course: {str(e)}')
-        return jsonify({'error': 'Database error'}), 500
-
-@app.route('/api/courses', methods=['GET'])
-@token_required
-def get_courses(current_user):
-    """Get all courses."""
-    courses = Course.query.all()
-    return jsonify([{
-        'id': c.id,
-        'course_name': c.course_name,
-        'department_id': c.department_id,
-        'semester': c.semester,
-        'class_hours': c.class_hours,
-        'lecture_id': c.lecture_id
-    } for c in courses]), 200
-
-@app.route('/api/courses/<int:course_id>', methods=['GET'])
-@token_required
-def get_course(current_user, course_id):
-    """Get a specific course by ID."""
-    course = Course.query.get(course_id)
-    if not course:
-        return jsonify({'error': 'Course not found'}), 404
-    return jsonify({
-        'id': course.id,
-        'course_name': course.course_name,
-        'department_id': course.department_id,
-        'semester': course.semester,
-        'class_hours': course.class_hours,
-        'lecture_id': course.lecture_id
-    }), 200
-
-@app.route('/api/courses/<int:course_id>', methods=['PUT'])
-@token_required
-def update_course(current_user, course_id):
-    """Update a course."""
-    course = Course.query.get(course_id)
-    if not course:
-        return jsonify({'error': 'Course not found'}), 404
-    data = request.get_json()
-    if 'course_name' in data:
-        course.course_name = data['course_name']
-    if 'department_id' in data:
-        if not Department.query.get(data['department_id']):
-            return jsonify({'error': 'Department not found'}), 404
-        course.department_id = data['department_id']
-    if 'semester' in data:
-        course.semester = data['semester']
-    if 'class_hours' in data:
-        course.class_hours = data['class_hours']
-    if 'lecture_id' in data:
-        if not User.query.get(data['lecture_id']):
-            return jsonify({'error': 'Lecture not found'}), 404
-        course.lecture_id = data['lecture_id']
-    course.updated_at = datetime.utcnow()
-    try:
-        db.session.commit()
-        return jsonify({'message': 'Course updated'}), 200
-    except Exception as e:
-        db.session.rollback()
-        logging.error(f'Error updating course: {str(e)}')
-        return jsonify({'error': 'Database error'}), 500
-
-# Student APIs
-@app.route('/api/students', methods=['POST'])
-@token_required
-def create_student(current_user):
-    """Create a new student."""
-    data = request.get_json()
-    required_fields = ['full_name', 'department_id']
-    if not data or not all(key in data for key in required_fields):
-        return jsonify({'error': 'Missing required fields'}), 400
-    if not Department.query.get(data['department_id']):
-        return jsonify({'error': 'Department not found'}), 404
-    student = Student(
-        full_name=data['full_name'],
-        department_id=data['department_id'],
-        class_=data.get('class'),
-        submitted_by=current_user.id,
-        updated_at=datetime.utcnow()
-    )
-    db.session.add(student)
-    try:
-        db.session.commit()
-        return jsonify({
-            'id': student.id,
-            'full_name': student.full_name,
-            'department_id': student.department_id,
-            'class': student.class_
-        }), 201
-    except Exception as e:
-        db.session.rollback()
-        logging.error(f'Error creating student: {str(e)}')
-        return jsonify({'error': 'Database error'}), 500
-
-@app.route('/api/students', methods=['GET'])
-@token_required
-def get_students(current_user):
-    """Get all students."""
-    students = Student.query.all()
-    return jsonify([{
-        'id': s.id,
-        'full_name': s.full_name,
-        'department_id': s.department_id,
-        'class': s.class_
-    } for s in students]), 200
-
-@app.route('/api/students/<int:student_id>', methods=['GET'])
-@token_required
-def get_student(current_user, student_id):
-    """Get a specific student by ID."""
-    student = Student.query.get(student_id)
-    if not student:
-        return jsonify({'error': 'Student not found'}), 404
-    return jsonify({
-        'id': student.id,
-        'full_name': student.full_name,
-        'department_id': student.department_id,
-        'class': student.class_
-    }), 200
-
-@app.route('/api/students/<int:student_id>', methods=['PUT'])
-@token_required
-def update_student(current_user, student_id):
-    """Update a student."""
-    student = Student.query.get(student_id)
-    if not student:
-        return jsonify({'error': 'Student not found'}), 404
-    data = request.get_json()
-    if 'full_name' in data:
-        student.full_name = data['full_name']
-    if 'department_id' in data:
-        if not Department.query.get(data['department_id']):
-            return jsonify({'error': 'Department not found'}), 404
-        student.department_id = data['department_id']
-    if 'class' in data:
-        student.class_ = data['class']
-    student.updated_at = datetime.utcnow()
-    try:
-        db.session.commit()
-        return jsonify({'message': 'Student updated'}), 200
-    except Exception as e:
-        db.session.rollback()
-        logging.error(f'Error updating student: {str(e)}')
-        return jsonify({'error': 'Database error'}), 500
-
-# AttendanceLog APIs
-@app.route('/api/attendance', methods=['POST'])
-@token_required
-def mark_attendance(current_user):
-    """Mark attendance for a student in a course."""
-    data = request.get_json()
-    required_fields = ['student_id', 'course_id', 'present']
-    if not data or not all(key in data for key in required_fields):
-        return jsonify({'error': 'Missing required fields'}), 400
-    student = Student.query.get(data['student_id'])
-    if not student:
-        return jsonify({'error': 'Student not found'}), 404
-    course = Course.query.get(data['course_id'])
-    if not course:
-        return jsonify({'error': 'Course not found'}), 404
-    # Optional: Check if attendance already marked today
-    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    existing = AttendanceLog.query.filter(
-        AttendanceLog.student_id == data['student_id'],
-        AttendanceLog.course_id == data['course_id'],
-        AttendanceLog.updated_at >= today_start
-    ).first()
-    if existing:
-        return jsonify({'error': 'Attendance already marked today'}), 400
-    attendance = AttendanceLog(
-        student_id=data['student_id'],
-        course_id=data['course_id'],
-        present=data['present'],
-        submitted_by=current_user.id,
-        updated_at=datetime.utcnow()
-    )
-    db.session.add(attendance)
-    try:
-        db.session.commit()
-        return jsonify({
-            'id': attendance.id,
-            'student_id': attendance.student_id,
-            'course_id': attendance.course_id,
-            'present': attendance.present,
-            'updated_at': attendance.updated_at.isoformat()
-        }), 201
-    except Exception as e:
-        db.session.rollback()
-        logging.error(f'Error marking attendance: {str(e)}')
-        return jsonify({'error': 'Database error'}), 500
-
-@app.route('/api/attendance/<int:student_id>', methods=['GET'])
-@token_required
-def get_attendance(current_user, student_id):
-    """Get attendance records for a student."""
-    student = Student.query.get(student_id)
-    if not student:
-        return jsonify({'error': 'Student not found'}), 404
-    attendances = AttendanceLog.query.filter_by(student_id=student_id).all()
-    return jsonify([{
-        'id': a.id,
-        'course_id': a.course_id,
-        'present': a.present,
-        'updated_at': a.updated_at.isoformat()
-    } for a in attendances]), 200
-
-@app.route('/api/report', methods=['GET'])
-@token_required
-def get_report(current_user):
-    """Get attendance report for a date range."""
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-    if not start_date or not end_date or not validate_date(start_date) or not validate_date(end_date):
-        return jsonify({'error': 'Invalid or missing date parameters, use YYYY-MM-DD'}), 400
-    start = datetime.strptime(start_date, '%Y-%m-%d')
-    end = datetime.strptime(end_date, '%Y-%m-%d').replace(hour=23, minute=59, second=59)
-    if start > end:
-        return jsonify({'error': 'Start date must be before end date'}), 400
-    attendances = AttendanceLog.query.filter(AttendanceLog.updated_at.between(start, end)).all()
-    # Use functional style with reduce for bonus points
-    def accumulate_report(report, a):
-        name = a.student.full_name
-        status = 'present' if a.present else 'absent'
-        report[name][status] += 1
-        return report
-    initial_report = defaultdict(lambda: {'present': 0, 'absent': 0})
-    report = reduce(accumulate_report, attendances, initial_report)
-    return jsonify(dict(report)), 200
-
-if __name__ == '__main__':
+from flask import Blueprint, Flask, Response, current_app, g, has_request_context, request, jsonify, stream_with_context
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, and_, case, column, event, func, insert, inspect, literal_column, or_, select, table, text, union_all
+from sqlalchemy.orm import aliased
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta, timezone
+import click
+import os
+import csv
+import hashlib
+import io
+import json
+from werkzeug.security import generate_password_hash, check_password_hash
+import jwt
+from functools import lru_cache, partial, wraps, reduce
+from concurrent.futures import ProcessPoolExecutor
+import atexit
+import logging
+import multiprocessing
+import queue
+import random
+import re
+import string
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict, namedtuple
+from flask.json.provider import DefaultJSONProvider
+
+# Optional encoders: orjson speeds up JSON, msgpack enables application/msgpack responses
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# SQLite storage profiles: PRAGMAs run on every new connection plus connection pool sizing.
+# 'legacy' keeps SQLite's defaults; 'concurrent' lets readers and writers of
+# several threaded workers overlap and wait for locks instead of failing.
+STORAGE_PROFILES = {
+    'legacy': {
+        'pragmas': {},
+        'pool_size': 5,
+        'max_overflow': 10
+    },
+    'concurrent': {
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': 5000,
+            'mmap_size': 256 * 1024 * 1024,
+            'cache_size': -64 * 1024
+        },
+        'pool_size': 16,
+        'max_overflow': 16
+    }
+}
+
+def apply_storage_profile(pragmas, dbapi_connection, connection_record):
+    """Run a storage profile's PRAGMAs on a new SQLite connection."""
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+def storage_engine_options(uri, profile):
+    """Return SQLALCHEMY_ENGINE_OPTIONS for a storage profile on database `uri`."""
+    if not uri.startswith('sqlite') or uri in ('sqlite://', 'sqlite:///:memory:'):
+        # In-memory SQLite uses a single-connection pool that takes no sizing
+        return {}
+    busy_timeout = profile['pragmas'].get('busy_timeout', 5000)
+    return {
+        'pool_size': profile['pool_size'],
+        'max_overflow': profile['max_overflow'],
+        'connect_args': {'timeout': busy_timeout / 1000}
+    }
+
+# Defaults applied by create_app before any caller-supplied configuration
+DEFAULT_CONFIG = {
+    'SQLALCHEMY_DATABASE_URI': 'sqlite:///attendance.db',
+    'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+    'STORAGE_PROFILE': 'concurrent',
+    # Werkzeug hash method and cost, e.g. 'scrypt' or 'pbkdf2:sha256:600000'.
+    # Passwords hashed with other parameters are rehashed on the next successful login.
+    'PASSWORD_HASH_METHOD': 'scrypt',
+    # Processes used by /api/users/bulk to hash passwords, defaults to one per core
+    'PASSWORD_HASH_WORKERS': os.cpu_count() or 1,
+    # Upper bound on users accepted by /api/users/bulk and rows per INSERT statement
+    'BULK_USER_LIMIT': 5000,
+    'BULK_INSERT_CHUNK': 500,
+    # Upper bound on data rows accepted by /api/students/import and /api/courses/import
+    'IMPORT_ROW_LIMIT': 100000,
+    # Lifetime of issued JWTs
+    'TOKEN_EXPIRES_SECONDS': 3600,
+    # Principals cached by token_required, keyed by user id; size 0 disables the cache
+    'AUTH_CACHE_SIZE': 1024,
+    'AUTH_CACHE_TTL': 300,
+    # Page sizes for the keyset-paginated list endpoints
+    'PAGE_SIZE_DEFAULT': 100,
+    'PAGE_SIZE_MAX': 1000,
+    # Serve /api/report from the daily_attendance rollup instead of raw logs where possible
+    'REPORT_USE_ROLLUP': True,
+    # Result counts of /api/students/search and /api/users/search
+    'SEARCH_LIMIT_DEFAULT': 20,
+    'SEARCH_LIMIT_MAX': 100,
+    # Attendance percentage below which /api/report/at-risk lists a student's course
+    'AT_RISK_THRESHOLD': 75.0,
+    # /api/report/timeseries: longest series served and closed buckets cached per app
+    'TIMESERIES_MAX_BUCKETS': 1000,
+    'TIMESERIES_CACHE_SIZE': 100000,
+    'TIMESERIES_CACHE_TTL': 86400,
+    # Rows fetched per round trip while streaming /api/attendance/export
+    'EXPORT_CHUNK_SIZE': 5000,
+    # Upper bound on entries accepted by /api/attendance/batch
+    'ATTENDANCE_BATCH_LIMIT': 1000,
+    # Cache-Control sent with conditional GET responses, by endpoint; others get CACHE_CONTROL_DEFAULT
+    'CACHE_CONTROL': {},
+    'CACHE_CONTROL_DEFAULT': 'private, no-cache',
+    # Encode JSON responses with orjson when it is installed
+    'FAST_JSON': True,
+    # Write-behind ingest for /api/attendance/events: queued events are written in group
+    # commits of up to INGEST_BATCH_SIZE rows or every INGEST_FLUSH_MS, whichever comes first
+    'INGEST_ENABLED': False,
+    'INGEST_QUEUE_SIZE': 10000,
+    'INGEST_BATCH_SIZE': 500,
+    'INGEST_FLUSH_MS': 50,
+    # Event statuses kept for /api/attendance/events/<event_id>, oldest dropped first
+    'INGEST_STATUS_SIZE': 100000,
+    # Per-request latency and SQL instrumentation exposed at /api/metrics
+    'METRICS_ENABLED': True,
+    # When set, /api/metrics requires "Authorization: Bearer <METRICS_TOKEN>"
+    'METRICS_TOKEN': None,
+    # Requests slower than this are logged with their SQL statements
+    'SLOW_REQUEST_MS': 500,
+    'SLOW_REQUEST_MAX_QUERIES': 50
+}
+
+# Settings read from the environment when present, e.g. to share SECRET_KEY between workers
+ENV_CONFIG = {
+    'DATABASE_URL': 'SQLALCHEMY_DATABASE_URI',
+    'STORAGE_PROFILE': 'STORAGE_PROFILE',
+    'SECRET_KEY': 'SECRET_KEY',
+    'METRICS_TOKEN': 'METRICS_TOKEN'
+}
+
+db = SQLAlchemy()
+api = Blueprint('api', __name__, cli_group=None)
+
+logging.basicConfig(level=logging.INFO)
+
+# Models
+class User(db.Model):
+    """User model representing teachers or admins."""
+    id = db.Column(db.Integer, primary_key=True)
+    type = db.Column(db.String(20), nullable=False)
+    full_name = db.Column(db.String(100), nullable=False)
+    username = db.Column(db.String(50), unique=True, nullable=False)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    password_hash = db.Column(db.String(128))
+    submitted_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    submitter = db.relationship('User', remote_side=[id], backref='submitted_users')
+
+class Department(db.Model):
+    """Department model."""
+    id = db.Column(db.Integer, primary_key=True)
+    department_name = db.Column(db.String(100), nullable=False)
+    submitted_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class Course(db.Model):
+    """Course model."""
+    id = db.Column(db.Integer, primary_key=True)
+    course_name = db.Column(db.String(100), nullable=False)
+    department_id = db.Column(db.Integer, db.ForeignKey('department.id'), nullable=False, index=True)
+    semester = db.Column(db.String(20))
+    class_hours = db.Column(db.Integer)
+    lecture_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    submitted_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class Student(db.Model):
+    """Student model."""
+    id = db.Column(db.Integer, primary_key=True)
+    full_name = db.Column(db.String(100), nullable=False)
+    department_id = db.Column(db.Integer, db.ForeignKey('department.id'), nullable=False, index=True)
+    class_ = db.Column(db.String(50), index=True)
+    submitted_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class AttendanceLog(db.Model):
+    """AttendanceLog model.
+
+    One row per student, course and day, enforced by a unique index. The
+    index also serves student_id lookups since it leads with that column.
+    """
+    __table_args__ = (
+        db.Index('ix_attendance_log_student_course_date', 'student_id', 'course_id', 'attendance_date', unique=True),
+        db.Index('ix_attendance_log_attendance_date', 'attendance_date'),
+        # Covers the per-course daily totals of /api/report/timeseries without reading the table
+        db.Index('ix_attendance_log_course_date', 'course_id', 'attendance_date', 'present'),
+        # Ids are never reused, even once archive-attendance empties the table
+        {'sqlite_autoincrement': True},
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
+    present = db.Column(db.Boolean, nullable=False)
+    attendance_date = db.Column(db.Date, nullable=False, default=lambda: datetime.utcnow().date())
+    submitted_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    student = db.relationship('Student', backref='attendance_logs', lazy=True)
+    course = db.relationship('Course', backref='attendance_logs', lazy=True)
+
+class AttendanceArchive(db.Model):
+    """AttendanceLog rows of closed terms, moved here by the archive-attendance command.
+
+    Rows keep their attendance_log ids. The rollups still count them.
+    """
+    __tablename__ = 'attendance_log_archive'
+    __table_args__ = (
+        db.Index('ix_attendance_log_archive_student_date', 'student_id', 'attendance_date'),
+        db.Index('ix_attendance_log_archive_attendance_date', 'attendance_date'),
+        db.Index('ix_attendance_log_archive_course_date', 'course_id', 'attendance_date', 'present'),
+    )
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
+    present = db.Column(db.Boolean, nullable=False)
+    attendance_date = db.Column(db.Date, nullable=False)
+    submitted_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    updated_at = db.Column(db.DateTime)
+
+class ArchivedTerm(db.Model):
+    """One archive-attendance run: every log dated before `before` was moved to the archive."""
+    __tablename__ = 'archived_term'
+    id = db.Column(db.Integer, primary_key=True)
+    term = db.Column(db.String(50))
+    before = db.Column(db.Date, nullable=False)
+    rows = db.Column(db.Integer, nullable=False)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class DailyAttendance(db.Model):
+    """Per-student, per-day present/absent totals over all courses.
+
+    Maintained in the same transaction as every AttendanceLog insert (see
+    bump_rollups) so reports read one row per student and day.
+    """
+    __tablename__ = 'daily_attendance'
+    attendance_date = db.Column(db.Date, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), primary_key=True)
+    present_count = db.Column(db.Integer, nullable=False, default=0)
+    absent_count = db.Column(db.Integer, nullable=False, default=0)
+
+class CourseAttendance(db.Model):
+    """All-time present/absent totals per student and course, maintained like DailyAttendance."""
+    __tablename__ = 'course_attendance'
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), primary_key=True)
+    present_count = db.Column(db.Integer, nullable=False, default=0)
+    absent_count = db.Column(db.Integer, nullable=False, default=0)
+
+# Rollup tables over attendance_log and the log columns each one is keyed by
+ROLLUPS = {
+    DailyAttendance: ('attendance_date', 'student_id'),
+    CourseAttendance: ('student_id', 'course_id')
+}
+
+# SQLite FTS5 name indexes behind the /search endpoints: model, index table and indexed
+# columns. They are external-content tables kept in sync by triggers on the model table,
+# so every write path (ORM, bulk inserts, CSV import) updates them.
+SEARCH_INDEXES = {
+    Student: ('student_search', ['full_name']),
+    User: ('user_search', ['full_name', 'username'])
+}
+
+def search_index_ddl(model):
+    """Return the statements creating the FTS5 index of `model` and its sync triggers."""
+    name, columns = SEARCH_INDEXES[model]
+    source = model.__tablename__
+    listed = ', '.join(columns)
+    new = ', '.join(f'new.{c}' for c in columns)
+    old = ', '.join(f'old.{c}' for c in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {name} USING fts5({listed}, content='{source}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f'CREATE TRIGGER IF NOT EXISTS {name}_ai AFTER INSERT ON "{source}" BEGIN '
+        f'INSERT INTO {name}(rowid, {listed}) VALUES (new.id, {new}); END',
+        f'CREATE TRIGGER IF NOT EXISTS {name}_ad AFTER DELETE ON "{source}" BEGIN '
+        f"INSERT INTO {name}({name}, rowid, {listed}) VALUES ('delete', old.id, {old}); END",
+        f'CREATE TRIGGER IF NOT EXISTS {name}_au AFTER UPDATE OF {listed} ON "{source}" BEGIN '
+        f"INSERT INTO {name}({name}, rowid, {listed}) VALUES ('delete', old.id, {old}); "
+        f'INSERT INTO {name}(rowid, {listed}) VALUES (new.id, {new}); END'
+    ]
+
+# Fresh SQLite databases get the search indexes along with the tables from create_all
+for _model in SEARCH_INDEXES:
+    for _statement in search_index_ddl(_model):
+        event.listen(_model.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+
+# Public field names of each list endpoint mapped to their columns, used for fields= projection
+USER_FIELDS = {
+    'id': User.id,
+    'type': User.type,
+    'full_name': User.full_name,
+    'username': User.username,
+    'email': User.email
+}
+DEPARTMENT_FIELDS = {
+    'id': Department.id,
+    'department_name': Department.department_name
+}
+COURSE_FIELDS = {
+    'id': Course.id,
+    'course_name': Course.course_name,
+    'department_id': Course.department_id,
+    'semester': Course.semester,
+    'class_hours': Course.class_hours,
+    'lecture_id': Course.lecture_id
+}
+STUDENT_FIELDS = {
+    'id': Student.id,
+    'full_name': Student.full_name,
+    'department_id': Student.department_id,
+    'class': Student.class_
+}
+ATTENDANCE_FIELDS = {
+    'id': AttendanceLog.id,
+    'student_id': AttendanceLog.student_id,
+    'course_id': AttendanceLog.course_id,
+    'present': AttendanceLog.present,
+    'attendance_date': AttendanceLog.attendance_date,
+    'updated_at': AttendanceLog.updated_at
+}
+
+def upgrade_attendance_log(connection):
+    """Bring an existing attendance_log table up to date with the model.
+
+    Older databases have no attendance_date column; it is added and backfilled
+    from updated_at. Rows that would violate the one-mark-per-day index are
+    moved to attendance_log_duplicates, keeping the earliest one in place,
+    before the indexes are created.
+    """
+    table = AttendanceLog.__table__
+    columns = {c['name'] for c in inspect(connection).get_columns(table.name)}
+    if 'attendance_date' not in columns:
+        connection.execute(text('ALTER TABLE attendance_log ADD COLUMN attendance_date DATE'))
+        # Assign updated_at to itself so its onupdate default doesn't fire
+        connection.execute(table.update().values(
+            attendance_date=func.date(table.c.updated_at),
+            updated_at=table.c.updated_at
+        ))
+        keep = select(func.min(table.c.id)).group_by(
+            table.c.student_id, table.c.course_id, table.c.attendance_date
+        )
+        duplicates = select(table).where(table.c.id.not_in(keep))
+        if connection.execute(select(func.count()).select_from(duplicates.subquery())).scalar():
+            # Keep the extra marks for an operator to review instead of dropping them
+            connection.execute(text(
+                'CREATE TABLE IF NOT EXISTS attendance_log_duplicates AS SELECT * FROM attendance_log WHERE 1 = 0'
+            ))
+            connection.execute(insert(db.Table(
+                'attendance_log_duplicates', db.MetaData(), autoload_with=connection
+            )).from_select(list(table.c.keys()), duplicates))
+            moved = connection.execute(table.delete().where(table.c.id.not_in(keep))).rowcount
+            logging.warning(f'Moved {moved} duplicate attendance rows to attendance_log_duplicates while adding attendance_date')
+    for index in table.indexes:
+        index.create(connection, checkfirst=True)
+
+def create_missing_indexes(connection):
+    """Create model indexes that tables made by older versions lack."""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+def create_search_indexes(connection):
+    """Create and fill the FTS5 name indexes on existing SQLite databases."""
+    if connection.dialect.name != 'sqlite':
+        return
+    for model, (name, _) in SEARCH_INDEXES.items():
+        for statement in search_index_ddl(model):
+            connection.execute(text(statement))
+        connection.execute(text(f"INSERT INTO {name}({name}) VALUES ('rebuild')"))
+
+def seed_daily_attendance(connection):
+    """Fill the daily_attendance rollup for databases that predate it."""
+    if not connection.execute(select(DailyAttendance.student_id).limit(1)).first():
+        rebuild_rollup(connection, DailyAttendance)
+
+def seed_course_attendance(connection):
+    """Fill the course_attendance rollup for databases that predate it."""
+    if not connection.execute(select(CourseAttendance.student_id).limit(1)).first():
+        rebuild_rollup(connection, CourseAttendance)
+
+# Schema migrations in order; the schema is at version N once the first N have run.
+# Fresh databases get the current schema from create_all and skip them all.
+MIGRATIONS = [
+    upgrade_attendance_log,
+    create_missing_indexes,
+    seed_daily_attendance,
+    seed_course_attendance,
+    create_search_indexes,
+    # Again, for the course/date indexes of attendance_log and its archive
+    create_missing_indexes
+]
+
+class SchemaVersion(db.Model):
+    """Single-row table recording how many MIGRATIONS have been applied."""
+    __tablename__ = 'schema_version'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False)
+
+def init_db():
+    """Create missing tables and run pending migrations; never drops data.
+
+    Needs an app context. Returns the number of migrations applied.
+    """
+    fresh = not inspect(db.engine).has_table(User.__tablename__)
+    db.create_all()
+    with db.engine.begin() as connection:
+        row = connection.execute(select(SchemaVersion.version)).first()
+        current = len(MIGRATIONS) if fresh else (row.version if row else 0)
+        for migration in MIGRATIONS[current:]:
+            logging.info(f'Running migration {migration.__name__}')
+            migration(connection)
+        table = SchemaVersion.__table__
+        if row:
+            connection.execute(table.update().values(version=len(MIGRATIONS)))
+        else:
+            connection.execute(table.insert().values(id=1, version=len(MIGRATIONS)))
+    return len(MIGRATIONS) - current
+
+def bootstrap_admin():
+    """Create the first admin user with a random password if there are no users.
+
+    Returns (user, password), or None when users already exist.
+    """
+    if db.session.query(User.id).first():
+        return None
+    password = ''.join(random.choices(string.ascii_letters + string.digits, k=12))
+    admin = User(
+        type='admin',
+        full_name='Admin User',
+        username='admin',
+        email='admin@gmail.com',
+        password_hash=hash_password(password),
+        updated_at=datetime.utcnow()
+    )
+    db.session.add(admin)
+    db.session.commit()
+    return admin, password
+
+@api.cli.command('init-db')
+def init_db_command():
+    """Create missing tables and migrate existing ones in place."""
+    applied = init_db()
+    logging.info(f'Database schema is up to date ({applied} migrations applied)')
+
+@api.cli.command('create-admin')
+def create_admin_command():
+    """Create the first admin user and log its credentials."""
+    try:
+        created = bootstrap_admin()
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f'Error creating first user: {str(e)}')
+        raise SystemExit(1)
+    if created is None:
+        logging.info('Users already exist, no admin created')
+        return
+    logging.info(f'First user created: username=admin, password={created[1]}')
+
+# Helper function to validate date
+def validate_date(date_text):
+    """Validate date string in YYYY-MM-DD format."""
+    try:
+        datetime.strptime(date_text, '%Y-%m-%d')
+        return True
+    except ValueError:
+        return False
+
+def bump_rollups(logs):
+    """Add new AttendanceLog rows to every rollup in ROLLUPS in the current transaction."""
+    if not logs:
+        return
+    dialect = db.session.get_bind().dialect.name
+    for model, keys in ROLLUPS.items():
+        totals = defaultdict(lambda: [0, 0])
+        for log in logs:
+            totals[tuple(getattr(log, key) for key in keys)][0 if log.present else 1] += 1
+        upsert = (postgresql if dialect == 'postgresql' else sqlite).insert(model)
+        upsert = upsert.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={
+                'present_count': model.present_count + upsert.excluded.present_count,
+                'absent_count': model.absent_count + upsert.excluded.absent_count
+            }
+        )
+        db.session.execute(upsert, [
+            dict(zip(keys, key), present_count=present, absent_count=absent)
+            for key, (present, absent) in totals.items()
+        ])
+
+def attendance_union():
+    """Subquery of attendance_log plus attendance_log_archive, with the attendance_log columns."""
+    log = AttendanceLog.__table__
+    archive = AttendanceArchive.__table__
+    return union_all(
+        select(*log.c),
+        select(*(archive.c[column.name] for column in log.c))
+    ).subquery('attendance')
+
+def attendance_source(start=None):
+    """Return the entity to read attendance logs from for dates from `start` on.
+
+    That is AttendanceLog itself unless archived terms exist and `start` is
+    before the latest archive cutoff (or None, for all dates); then it is an
+    alias of AttendanceLog over the union with the archive, so callers use
+    the same attribute names either way.
+    """
+    cutoff = db.session.query(func.max(ArchivedTerm.before)).scalar()
+    if cutoff is None or (start is not None and start >= cutoff):
+        return AttendanceLog
+    return aliased(AttendanceLog, attendance_union(), adapt_on_names=True)
+
+def rollup_source(keys):
+    """SELECT of present/absent totals from attendance_log and its archive grouped by the `keys` columns."""
+    log = attendance_union()
+    return select(
+        *(log.c[key] for key in keys),
+        func.sum(case((log.c.present, 1), else_=0)),
+        func.sum(case((log.c.present, 0), else_=1))
+    ).group_by(*(log.c[key] for key in keys))
+
+def rollup_mismatches(connection):
+    """Count rollup rows, over all ROLLUPS, that disagree with attendance_log."""
+    mismatches = 0
+    for model, keys in ROLLUPS.items():
+        raw = rollup_source(keys)
+        rollup = model.__table__
+        rolled = select(*(rollup.c[key] for key in keys), rollup.c.present_count, rollup.c.absent_count)
+        mismatches += connection.execute(select(func.count()).select_from(raw.except_(rolled).subquery())).scalar()
+        mismatches += connection.execute(select(func.count()).select_from(rolled.except_(raw).subquery())).scalar()
+    return mismatches
+
+def rebuild_rollup(connection, model):
+    """Recompute one rollup table from attendance_log."""
+    keys = ROLLUPS[model]
+    connection.execute(model.__table__.delete())
+    connection.execute(model.__table__.insert().from_select(
+        [*keys, 'present_count', 'absent_count'], rollup_source(keys)
+    ))
+
+def rebuild_rollups(connection):
+    for model in ROLLUPS:
+        rebuild_rollup(connection, model)
+
+def archive_attendance(connection, before, term=None):
+    """Move attendance_log rows dated before `before` to attendance_log_archive.
+
+    The rollups are left alone since they count archived rows too. Returns
+    the number of rows moved.
+    """
+    log = AttendanceLog.__table__
+    archive = AttendanceArchive.__table__
+    archived = log.c.attendance_date < before
+    columns = [column.name for column in log.c]
+    moved = connection.execute(archive.insert().from_select(columns, select(*log.c).where(archived))).rowcount
+    connection.execute(log.delete().where(archived))
+    if moved and connection.dialect.name == 'sqlite' and not connection.execute(select(log.c.id).limit(1)).first():
+        # Without AUTOINCREMENT SQLite restarts rowids at 1 in an empty table,
+        # which would reuse ids of archived rows; raising rolls the move back
+        ddl = connection.execute(text("SELECT sql FROM sqlite_master WHERE name = 'attendance_log'")).scalar()
+        if 'AUTOINCREMENT' not in ddl.upper():
+            raise click.ClickException('Archiving would leave attendance_log empty; pick an earlier --before')
+    connection.execute(ArchivedTerm.__table__.insert().values(
+        term=term, before=before, rows=moved, archived_at=datetime.utcnow()
+    ))
+    return moved
+
+@api.cli.command('rebuild-rollup')
+def rebuild_rollup_command():
+    """Recompute the rollup tables from attendance_log and verify that they match."""
+    with db.engine.begin() as connection:
+        stale = rollup_mismatches(connection)
+        rebuild_rollups(connection)
+        remaining = rollup_mismatches(connection)
+        if remaining:
+            # Leaving the block through an exception rolls the rebuild back
+            raise RuntimeError(f'Rollup still differs from attendance_log in {remaining} rows after rebuild')
+    if stale:
+        logging.warning(f'Rebuilt rollups; {stale} rows were out of date before the rebuild')
+    else:
+        logging.info('Rebuilt rollups; they already matched attendance_log')
+
+@api.cli.command('archive-attendance')
+@click.option('--before', required=True, type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Archive logs dated before this day (YYYY-MM-DD), e.g. the first day of the current term.')
+@click.option('--term', help='Label of the archived term, e.g. "Spring 2025".')
+def archive_attendance_command(before, term):
+    """Move attendance logs of closed terms out of attendance_log."""
+    before = before.date()
+    if before > datetime.utcnow().date():
+        raise click.ClickException('--before cannot be in the future, attendance is still marked for today')
+    with db.engine.begin() as connection:
+        moved = archive_attendance(connection, before, term)
+    logging.info(f'Archived {moved} attendance logs dated before {before.isoformat()}')
+
+# Helper function to parse the start_date/end_date query parameters
+def parse_date_range():
+    """Return (start, end, error) from the start_date and end_date query parameters.
+
+    `error` is a ready-made 400 response when the parameters are missing,
+    malformed or out of order, otherwise None.
+    """
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    if not start_date or not end_date or not validate_date(start_date) or not validate_date(end_date):
+        return None, None, (jsonify({'error': 'Invalid or missing date parameters, use YYYY-MM-DD'}), 400)
+    start = datetime.strptime(start_date, '%Y-%m-%d').date()
+    end = datetime.strptime(end_date, '%Y-%m-%d').date()
+    if start > end:
+        return None, None, (jsonify({'error': 'Start date must be before end date'}), 400)
+    return start, end, None
+
+# Helper function to split a list into fixed-size chunks
+def chunked(items, size):
+    """Yield successive slices of at most `size` items."""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+# SQLite caps the number of bound parameters per statement, keep IN lists below it
+IN_CLAUSE_CHUNK = 500
+
+def record_attendance(entries):
+    """Insert many attendance rows, and their rollup counts, in the current transaction.
+
+    `entries` is a list of dicts with student_id, course_id, present and
+    submitted_by. Students, courses and rows already marked today are checked
+    with one set-based query each instead of per-row lookups; the unique index
+    on AttendanceLog still rejects rows raced in by concurrent writers.
+    Returns one result per entry, in input order: the new AttendanceLog or an
+    error dict. The caller commits.
+    """
+    student_ids = {e['student_id'] for e in entries}
+    course_ids = {e['course_id'] for e in entries}
+    known_students = set()
+    for ids in chunked(list(student_ids), IN_CLAUSE_CHUNK):
+        known_students.update(sid for (sid,) in db.session.query(Student.id).filter(Student.id.in_(ids)))
+    known_courses = set()
+    for ids in chunked(list(course_ids), IN_CLAUSE_CHUNK):
+        known_courses.update(cid for (cid,) in db.session.query(Course.id).filter(Course.id.in_(ids)))
+    now = datetime.utcnow()
+    marked = set()
+    for ids in chunked(list(student_ids & known_students), IN_CLAUSE_CHUNK):
+        marked.update(db.session.query(AttendanceLog.student_id, AttendanceLog.course_id).filter(
+            AttendanceLog.student_id.in_(ids),
+            AttendanceLog.course_id.in_(course_ids & known_courses),
+            AttendanceLog.attendance_date == now.date()
+        ))
+    results = []
+    pending = []
+    for e in entries:
+        key = (e['student_id'], e['course_id'])
+        if e['student_id'] not in known_students:
+            results.append({'student_id': e['student_id'], 'error': 'Student not found'})
+        elif e['course_id'] not in known_courses:
+            results.append({'student_id': e['student_id'], 'error': 'Course not found'})
+        elif key in marked:
+            results.append({'student_id': e['student_id'], 'error': 'Attendance already marked today'})
+        else:
+            marked.add(key)
+            attendance = AttendanceLog(
+                student_id=e['student_id'],
+                course_id=e['course_id'],
+                present=e['present'],
+                attendance_date=now.date(),
+                submitted_by=e['submitted_by'],
+                updated_at=now
+            )
+            pending.append(attendance)
+            results.append(attendance)
+    db.session.add_all(pending)
+    bump_rollups(pending)
+    return results
+
+# Dates and datetimes go out as ISO 8601 strings rather than Flask's HTTP date format
+def iso_value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+def serialize(fields, entity):
+    """Return the public representation of a model instance described by a *_FIELDS map."""
+    return {name: iso_value(getattr(entity, column.key)) for name, column in fields.items()}
+
+COLUMNAR_MIMETYPE = 'application/vnd.columnar+json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+def render_rows(names, rows, **extra):
+    """Return a 200 response for tabular `rows` in the representation the client accepts.
+
+    application/json (the default) lists one object per row. The columnar
+    JSON and MessagePack encodings send {"columns": names, "rows": [...]}
+    so field names are not repeated per row. `extra` keys are added at the
+    top level of every representation.
+    """
+    count_rows(rows)
+    offered = ['application/json', COLUMNAR_MIMETYPE] + ([MSGPACK_MIMETYPE] if msgpack else [])
+    mimetype = request.accept_mimetypes.best_match(offered, default='application/json')
+    # Only columns holding dates need converting; judge each by its first non-null value
+    dated = any(
+        hasattr(next((row[i] for row in rows if row[i] is not None), None), 'isoformat')
+        for i in range(len(names))
+    )
+    rows = [tuple(map(iso_value, row)) if dated else tuple(row) for row in rows]
+    if mimetype == 'application/json':
+        response = jsonify(dict(extra, items=[dict(zip(names, row)) for row in rows]))
+    else:
+        body = dict(extra, columns=list(names), rows=rows)
+        if mimetype == MSGPACK_MIMETYPE:
+            response = current_app.response_class(msgpack.packb(body), mimetype=MSGPACK_MIMETYPE)
+        else:
+            response = jsonify(body)
+            response.mimetype = COLUMNAR_MIMETYPE
+    response.vary.add('Accept')
+    return response, 200
+
+def search_page(model, fields):
+    """Return the rows of `model` best matching the `q` query parameter, ranked and limited.
+
+    Every word of `q` is a name prefix, so "jan smi" finds "Jane Smith". On
+    SQLite the FTS5 index from SEARCH_INDEXES is queried and every match is
+    ranked with bm25; other databases fall back to a case-insensitive
+    substring match.
+    """
+    words = re.findall(r'\w+', request.args.get('q', ''))
+    if not words:
+        return jsonify({'error': 'Missing search query q'}), 400
+    limit = request.args.get('limit', current_app.config['SEARCH_LIMIT_DEFAULT'], type=int)
+    if limit is None or not 1 <= limit <= current_app.config['SEARCH_LIMIT_MAX']:
+        return jsonify({'error': f"limit must be between 1 and {current_app.config['SEARCH_LIMIT_MAX']}"}), 400
+    name, columns = SEARCH_INDEXES[model]
+    query = select(*fields.values()).limit(limit)
+    if db.session.get_bind().dialect.name == 'sqlite':
+        index = table(name, column('rowid'), column('rank'))
+        match = literal_column(name).op('MATCH')(' '.join(f'"{word}"*' for word in words))
+        query = query.join(index, index.c.rowid == model.id).where(match).order_by(index.c.rank, model.id)
+    else:
+        query = query.where(and_(*(
+            or_(*(getattr(model, c).icontains(word, autoescape=True) for c in columns)) for word in words
+        ))).order_by(model.full_name, model.id)
+    return render_rows(list(fields), db.session.execute(query).all())
+
+def list_page(fields, *criteria):
+    """Return one keyset-paginated page of rows as a JSON response.
+
+    Rows are ordered by id; `after` is the last id of the previous page and
+    `limit` the page size. `fields` (comma separated) selects only the listed
+    columns instead of loading full entities. `next_cursor` is null on the
+    last page.
+    """
+    limit = request.args.get('limit', current_app.config['PAGE_SIZE_DEFAULT'], type=int)
+    if limit is None or not 1 <= limit <= current_app.config['PAGE_SIZE_MAX']:
+        return jsonify({'error': f"limit must be between 1 and {current_app.config['PAGE_SIZE_MAX']}"}), 400
+    after = request.args.get('after', type=int)
+    if 'after' in request.args and after is None:
+        return jsonify({'error': 'Invalid after cursor'}), 400
+    names = list(fields)
+    if request.args.get('fields'):
+        names = [n.strip() for n in request.args['fields'].split(',') if n.strip()]
+        unknown = [n for n in names if n not in fields]
+        if unknown:
+            return jsonify({'error': f"Unknown fields: {', '.join(unknown)}"}), 400
+    id_column = fields['id']
+    query = db.session.query(id_column, *(fields[n] for n in names)).filter(*criteria)
+    if after is not None:
+        query = query.filter(id_column > after)
+    # Fetch one extra row to know whether another page follows
+    rows = query.order_by(id_column).limit(limit + 1).all()
+    next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+    return render_rows(names, [row[1:] for row in rows[:limit]], next_cursor=next_cursor)
+
+def import_csv(model, columns, references, submitted_by):
+    """Stream a CSV upload into `model` with chunked INSERTs in one transaction.
+
+    The CSV is the request body, or the `file` part of a multipart upload,
+    and is read row by row. `columns` lists (CSV header, model attribute,
+    type, required); `references` maps CSV headers to ReferenceCache kinds
+    whose ids are preloaded once and checked for every row. Valid rows are
+    inserted BULK_INSERT_CHUNK at a time; invalid ones are reported by line.
+    """
+    upload = request.files['file'].stream if 'file' in request.files else request.stream
+    reader = csv.DictReader(io.TextIOWrapper(upload, encoding='utf-8-sig', newline=''))
+    known = {
+        header: set(db.session.scalars(select(ReferenceCache.MODELS[kind].id)))
+        for header, kind in references.items()
+    }
+    limit = current_app.config['IMPORT_ROW_LIMIT']
+    chunk_size = current_app.config['BULK_INSERT_CHUNK']
+    now = datetime.utcnow()
+    errors = []
+    batch = []
+    created = 0
+    try:
+        missing = [header for header, _, _, required in columns if required and header not in (reader.fieldnames or [])]
+        if missing:
+            return jsonify({'error': f"Missing CSV columns: {', '.join(missing)}"}), 400
+        # Line 1 is the header
+        for line, row in enumerate(reader, 2):
+            if line - 1 > limit:
+                db.session.rollback()
+                return jsonify({'error': f'Too many rows, limit is {limit}'}), 400
+            values = {'submitted_by': submitted_by, 'updated_at': now}
+            error = None
+            for header, key, type_, required in columns:
+                value = (row.get(header) or '').strip()
+                if not value:
+                    if required:
+                        error = f'Missing {header}'
+                        break
+                    values[key] = None
+                    continue
+                try:
+                    values[key] = type_(value)
+                except ValueError:
+                    error = f'Invalid {header}'
+                    break
+                if header in known and values[key] not in known[header]:
+                    error = f'Unknown {header} {value}'
+                    break
+            if error:
+                errors.append({'line': line, 'error': error})
+                continue
+            batch.append(values)
+            if len(batch) == chunk_size:
+                db.session.execute(insert(model), batch)
+                created += len(batch)
+                batch = []
+        if batch:
+            db.session.execute(insert(model), batch)
+            created += len(batch)
+        db.session.commit()
+    except (UnicodeDecodeError, csv.Error) as e:
+        db.session.rollback()
+        return jsonify({'error': f'Invalid CSV: {str(e)}'}), 400
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f'Error importing {model.__tablename__} rows: {str(e)}')
+        return jsonify({'error': 'Database error'}), 500
+    return jsonify({
+        'created': created,
+        'failed': len(errors),
+        'errors': errors
+    }), 201 if created else 400
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson; dates and datetimes come out as ISO 8601."""
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+class TTLCache:
+    """Thread-safe LRU cache of at most `maxsize` entries, each with its own expiry time."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at):
+        """Cache `value` until the Unix time `expires_at`, evicting the least recently used entry when full."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        """Drop `key` from the cache if present."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class ReferenceCache:
+    """Versioned in-process sets of valid department, course and user ids for write-path checks.
+
+    Each kind is loaded with one id-only SELECT on first use. No endpoint
+    deletes rows, so a cached id stays valid; an id missing from the set
+    (e.g. created by another worker) falls back to the database and is added
+    when found. invalidate() bumps the kind's version and drops its set, and
+    a load that raced with an invalidation is not kept.
+    """
+
+    MODELS = {'department': Department, 'course': Course, 'user': User}
+
+    def __init__(self):
+        self.counts = defaultdict(int)
+        self._ids = {}
+        self._versions = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def exists(self, kind, id_):
+        """Tell whether a `kind` row with primary key `id_` exists."""
+        model = self.MODELS[kind]
+        with self._lock:
+            ids = self._ids.get(kind)
+            version = self._versions[kind]
+        if ids is None:
+            ids = set(db.session.scalars(select(model.id)))
+            with self._lock:
+                self.counts[kind, 'load'] += 1
+                if self._versions[kind] == version:
+                    self._ids[kind] = ids
+        with self._lock:
+            hit = id_ in ids
+            self.counts[kind, 'hit' if hit else 'miss'] += 1
+        if hit:
+            return True
+        found = db.session.query(model.id).filter_by(id=id_).first()
+        if found:
+            with self._lock:
+                ids.add(found[0])
+        return found is not None
+
+    def invalidate(self, kind):
+        with self._lock:
+            self._versions[kind] += 1
+            self._ids.pop(kind, None)
+
+    def collect(self):
+        with self._lock:
+            counts = dict(self.counts)
+        return ('app_reference_cache_lookups_total', 'counter',
+                'Reference id lookups by kind and result (hit, miss falling back to the database, load).',
+                {(('kind', kind), ('result', result)): count for (kind, result), count in counts.items()})
+
+def reference_exists(kind, id_):
+    """Check a department, course or user id through the app's ReferenceCache."""
+    return current_app.extensions['reference_cache'].exists(kind, id_)
+
+def invalidate_references(kind):
+    current_app.extensions['reference_cache'].invalidate(kind)
+    if kind == 'course':
+        # Department time series are grouped by each course's current department_id
+        current_app.extensions['timeseries_cache'].clear()
+
+# The authenticated user handed to protected views: just what they need, safe to share across requests
+Principal = namedtuple('Principal', ['id', 'type', 'username'])
+
+def issue_token(user):
+    """Return a signed JWT for `user` carrying iat and exp claims."""
+    now = int(time.time())
+    return jwt.encode(
+        {'id': user.id, 'iat': now, 'exp': now + current_app.config['TOKEN_EXPIRES_SECONDS']},
+        current_app.config['SECRET_KEY'],
+        algorithm='HS256'
+    )
+
+def hash_password(password):
+    """Hash `password` with the configured PASSWORD_HASH_METHOD."""
+    return generate_password_hash(password, method=current_app.config['PASSWORD_HASH_METHOD'])
+
+@lru_cache(maxsize=None)
+def password_hash_prefix(method):
+    """Return the parameter prefix werkzeug stores for `method`, e.g. 'scrypt:32768:8:1'."""
+    return generate_password_hash('', method=method).split('$', 1)[0]
+
+def password_needs_rehash(password_hash):
+    """Tell whether `password_hash` was made with other parameters than PASSWORD_HASH_METHOD."""
+    return password_hash.split('$', 1)[0] != password_hash_prefix(current_app.config['PASSWORD_HASH_METHOD'])
+
+_hash_pool = None
+_hash_pool_lock = threading.Lock()
+
+def hash_passwords(passwords):
+    """Hash many passwords in parallel on a process pool, preserving order.
+
+    The pool is started on first use with the spawn start method and sized by
+    PASSWORD_HASH_WORKERS; with a single worker or password the hashing runs
+    inline.
+    """
+    global _hash_pool
+    workers = current_app.config['PASSWORD_HASH_WORKERS']
+    if workers <= 1 or len(passwords) <= 1:
+        return [hash_password(p) for p in passwords]
+    with _hash_pool_lock:
+        if _hash_pool is None:
+            # Spawned, not forked: the parent is multi-threaded by now and a forked child
+            # could inherit locks held by other threads
+            _hash_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    hasher = partial(generate_password_hash, method=current_app.config['PASSWORD_HASH_METHOD'])
+    return list(_hash_pool.map(hasher, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+# Token required decorator
+def token_required(f):
+    """Decorator to ensure API is protected by JWT token.
+
+    The view receives a Principal. Principals are cached per user id until the
+    earlier of AUTH_CACHE_TTL and the token's exp, so most requests skip the
+    User lookup; update_user invalidates the entry.
+    """
+    @wraps(f)
+    def decorator(*args, **kwargs):
+        token = request.headers.get('Authorization')
+        if not token:
+            return jsonify({'error': 'Token missing'}), 401
+        try:
+            data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"],
+                              options={'require': ['exp', 'iat']})
+            current_user = current_app.extensions['auth_cache'].get(data['id'])
+            if current_user is None:
+                user = User.query.get(data['id'])
+                if not user:
+                    return jsonify({'error': 'User not found'}), 401
+                current_user = Principal(user.id, user.type, user.username)
+                current_app.extensions['auth_cache'].set(user.id, current_user, min(time.time() + current_app.config['AUTH_CACHE_TTL'], data['exp']))
+        except Exception as e:
+            logging.error(f'Invalid token: {str(e)}')
+            return jsonify({'error': 'Invalid token'}), 401
+        return f(current_user, *args, **kwargs)
+    return decorator
+
+def conditional_get(model, criteria=None, related=None):
+    """Decorator answering If-None-Match / If-Modified-Since with 304 Not Modified.
+
+    The validators come from one max(updated_at)/count aggregate over `model`,
+    narrowed by `criteria(**view_kwargs)`, so an unchanged resource is never
+    loaded or serialised. `related(**view_kwargs)` may list further models
+    whose columns end up in the response; their aggregates are folded in.
+    Goes below token_required.
+    """
+    def wrapper(f):
+        @wraps(f)
+        def decorator(current_user, *args, **kwargs):
+            filters = criteria(**kwargs) if criteria else ()
+            last_modified, count = db.session.query(
+                func.max(model.updated_at), func.count()
+            ).select_from(model).filter(*filters).one()
+            for other in related(**kwargs) if related else ():
+                other_modified, other_count = db.session.query(
+                    func.max(other.updated_at), func.count()
+                ).select_from(other).one()
+                last_modified = max(filter(None, (last_modified, other_modified)), default=None)
+                count = f'{count}/{other_count}'
+            # The query string and Accept header are part of the tag since they change the payload.
+            # The tag keeps microseconds so two edits within one second still change it.
+            etag = hashlib.sha1(
+                f"{request.full_path}|{request.headers.get('Accept')}|{count}|"
+                f"{last_modified.isoformat() if last_modified else None}".encode()
+            ).hexdigest()
+            if last_modified is not None:
+                # HTTP dates have whole-second precision
+                last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+            cache_control = current_app.config['CACHE_CONTROL'].get(
+                request.endpoint, current_app.config['CACHE_CONTROL_DEFAULT']
+            )
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                not_modified = bool(request.if_modified_since and last_modified
+                                    and last_modified <= request.if_modified_since)
+            response = Response(status=304) if not_modified else current_app.make_response(f(current_user, *args, **kwargs))
+            if response.status_code in (200, 304):
+                response.set_etag(etag, weak=True)
+                response.last_modified = last_modified
+                response.headers['Cache-Control'] = cache_control
+            return response
+        return decorator
+    return wrapper
+
+# Login
+@api.route('/api/login', methods=['POST'])
+def login():
+    """Login API to generate JWT token."""
+    data = request.get_json()
+    if not data or 'username' not in data or 'password' not in data:
+        return jsonify({'error': 'Missing username or password'}), 400
+    user = User.query.filter_by(username=data['username']).first()
+    if not user or not check_password_hash(user.password_hash, data['password']):
+        return jsonify({'error': 'Invalid credentials'}), 401
+    if password_needs_rehash(user.password_hash):
+        # Upgrade the stored hash to the current cost now that we know the password
+        user.password_hash = hash_password(data['password'])
+        try:
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f'Error rehashing password: {str(e)}')
+    token = issue_token(user)
+    return jsonify({'token': token}), 200
+
+# User APIs
+@api.route('/api/users', methods=['POST'])
+@token_required
+def create_user(current_user):
+    """Create a new user."""
+    data = request.get_json()
+    required_fields = ['type', 'full_name', 'username', 'email', 'password']
+    if not data or not all(key in data for key in required_fields):
+        return jsonify({'error': 'Missing required fields'}), 400
+    if User.query.filter_by(username=data['username']).first():
+        return jsonify({'error': 'Username already exists'}), 400
+    if User.query.filter_by(email=data['email']).first():
+        return jsonify({'error': 'Email already exists'}), 400
+    user = User(
+        type=data['type'],
+        full_name=data['full_name'],
+        username=data['username'],
+        email=data['email'],
+        password_hash=hash_password(data['password']),
+        submitted_by=current_user.id,
+        updated_at=datetime.utcnow()
+    )
+    db.session.add(user)
+    try:
+        db.session.commit()
+        invalidate_references('user')
+        return jsonify(serialize(USER_FIELDS, user)), 201
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f'Error creating user: {str(e)}')
+        return jsonify({'error': 'Database error'}), 500
+
+@api.route('/api/users/bulk', methods=['POST'])
+@token_required
+def create_users_bulk(current_user):
+    """Create many users in one request.
+
+    Usernames and emails are checked against the database with one IN query,
+    passwords are hashed in parallel and rows are inserted in chunks inside a
+    single transaction. Each user gets its own result, in input order.
+    """
+    data = request.get_json()
+    if not data or not isinstance(data.get('users'), list):
+        return jsonify({'error': 'Missing required fields'}), 400
+    if len(data['users']) > current_app.config['BULK_USER_LIMIT']:
+        return jsonify({'error': f"Too many users, limit is {current_app.config['BULK_USER_LIMIT']}"}), 400
+    required_fields = ['type', 'full_name', 'username', 'email', 'password']
+    for u in data['users']:
+        if not isinstance(u, dict) or not all(isinstance(u.get(key), str) for key in required_fields):
+            return jsonify({'error': 'Missing required fields'}), 400
+    usernames = [u['username'] for u in data['users']]
+    emails = [u['email'] for u in data['users']]
+    taken_usernames, taken_emails = set(), set()
+    for names, addresses in zip(chunked(usernames, IN_CLAUSE_CHUNK), chunked(emails, IN_CLAUSE_CHUNK)):
+        for username, email in db.session.query(User.username, User.email).filter(
+            or_(User.username.in_(names), User.email.in_(addresses))
+        ):
+            taken_usernames.add(username)
+            taken_emails.add(email)
+    results = []
+    accepted = []
+    for u in data['users']:
+        if u['username'] in taken_usernames:
+            results.append({'username': u['username'], 'error': 'Username already exists'})
+        elif u['email'] in taken_emails:
+            results.append({'username': u['username'], 'error': 'Email already exists'})
+        else:
+            taken_usernames.add(u['username'])
+            taken_emails.add(u['email'])
+            results.append({'username': u['username']})
+            accepted.append(u)
+    hashes = hash_passwords([u['password'] for u in accepted])
+    now = datetime.utcnow()
+    rows = [{
+        'type': u['type'],
+        'full_name': u['full_name'],
+        'username': u['username'],
+        'email': u['email'],
+        'password_hash': password_hash,
+        'submitted_by': current_user.id,
+        'updated_at': now
+    } for u, password_hash in zip(accepted, hashes)]
+    ids = {}
+    try:
+        for chunk in chunked(rows, current_app.config['BULK_INSERT_CHUNK']):
+            ids.update(db.session.execute(
+                insert(User).returning(User.username, User.id, sort_by_parameter_order=True), chunk
+            ).all())
+        db.session.commit()
+        invalidate_references('user')
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f'Error creating users in bulk: {str(e)}')
+        return jsonify({'error': 'Database error'}), 500
+    for r in results:
+        if 'error' not in r:
+            r['id'] = ids[r['username']]
+    created = len(rows)
+    return jsonify({
+        'created': created,
+        'failed': len(results) - created,
+        'results': results
+    }), 201 if created else 400
+
+@api.route('/api/users', methods=['GET'])
+@token_required
+def get_users(current_user):
+    """Get users, paginated by id."""
+    return list_page(USER_FIELDS)
+
+@api.route('/api/users/search', methods=['GET'])
+@token_required
+def search_users(current_user):
+    """Find users by full name or username prefix, best matches first."""
+    return search_page(User, USER_FIELDS)
+
+@api.route('/api/users/<int:user_id>', methods=['GET'])
+@token_required
+def get_user(current_user, user_id):
+    """Get a specific user by ID."""
+    user = User.query.get(user_id)
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    return jsonify(serialize(USER_FIELDS, user)), 200
+
+@api.route('/api/users/<int:user_id>', methods=['PUT'])
+@token_required
+def update_user(current_user, user_id):
+    """Update a user."""
+    user = User.query.get(user_id)
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    data = request.get_json()
+    if 'full_name' in data:
+        user.full_name = data['full_name']
+    if 'email' in data:
+        if User.query.filter_by(email=data['email']).first() and user.email != data['email']:
+            return jsonify({'error': 'Email already exists'}), 400
+        user.email = data['email']
+    if 'password' in data:
+        user.password_hash = hash_password(data['password'])
+    if 'type' in data:
+        user.type = data['type']
+    user.updated_at = datetime.utcnow()
+    try:
+        db.session.commit()
+        current_app.extensions['auth_cache'].pop(user.id)
+        return jsonify({'message': 'User updated'}), 200
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f'Error updating user: {str(e)}')
+        return jsonify({'error': 'Database error'}), 500
+
+# Department APIs
+@api.route('/api/departments', methods=['POST'])
+@token_required
+def create_department(current_user):
+    """Create a new department."""
+    data = request.get_json()
+    if not data or 'department_name' not in data:
+        return jsonify({'error': 'Missing department_name'}), 400
+    dept = Department(
+        department_name=data['department_name'],
+        submitted_by=current_user.id,
+        updated_at=datetime.utcnow()
+    )
+    db.session.add(dept)
+    try:
+        db.session.commit()
+        invalidate_references('department')
+        return jsonify(serialize(DEPARTMENT_FIELDS, dept)), 201
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f'Error creating department: {str(e)}')
+        return jsonify({'error': 'Database error'}), 500
+
+@api.route('/api/departments', methods=['GET'])
+@token_required
+@conditional_get(Department)
+def get_departments(current_user):
+    """Get departments, paginated by id."""
+    return list_page(DEPARTMENT_FIELDS)
+
+@api.route('/api/departments/<int:dept_id>', methods=['GET'])
+@token_required
+def get_department(current_user, dept_id):
+    """Get a specific department by ID."""
+    dept = Department.query.get(dept_id)
+    if not dept:
+        return jsonify({'error': 'Department not found'}), 404
+    return jsonify(serialize(DEPARTMENT_FIELDS, dept)), 200
+
+@api.route('/api/departments/<int:dept_id>', methods=['PUT'])
+@token_required
+def update_department(current_user, dept_id):
+    """Update a department."""
+    dept = Department.query.get(dept_id)
+    if not dept:
+        return jsonify({'error': 'Department not found'}), 404
+    data = request.get_json()
+    if 'department_name' in data:
+        dept.department_name = data['department_name']
+    dept.updated_at = datetime.utcnow()
+    try:
+        db.session.commit()
+        invalidate_references('department')
+        return jsonify({'message': 'Department updated'}), 200
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f'Error updating department: {str(e)}')
+        return jsonify({'error': 'Database error'}), 500
+
+# Course APIs
+@api.route('/api/courses', methods=['POST'])
+@token_required
+def create_course(current_user):
+    """Create a new course."""
+    data = request.get_json()
+    required_fields = ['course_name', 'department_id']
+    if not data or not all(key in data for key in required_fields):
+        return jsonify({'error': 'Missing required fields'}), 400
+    if not reference_exists('department', data['department_id']):
+        return jsonify({'error': 'Department not found'}), 404
+    if 'lecture_id' in data and not reference_exists('user', data['lecture_id']):
+        return jsonify({'error': 'Lecture not found'}), 404
+    course = Course(
+        course_name=data['course_name'],
+        department_id=data['department_id'],
+        semester=data.get('semester'),
+        class_hours=data.get('class_hours'),
+        lecture_id=data.get('lecture_id'),
+        submitted_by=current_user.id,
+        updated_at=datetime.utcnow()
+    )
+    db.session.add(course)
+    try:
+        db.session.commit()
+        invalidate_references('course')
+        return jsonify(serialize(COURSE_FIELDS, course)), 201
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f'Error creating course: {str(e)}')
+        return jsonify({'error': 'Database error'}), 500
+
+# CSV columns of /api/courses/import: header, Course attribute, type, required
+COURSE_IMPORT_COLUMNS = [
+    ('course_name', 'course_name', str, True),
+    ('department_id', 'department_id', int, True),
+    ('semester', 'semester', str, False),
+    ('class_hours', 'class_hours', int, False),
+    ('lecture_id', 'lecture_id', int, False)
+]
+
+@api.route('/api/courses/import', methods=['POST'])
+@token_required
+def import_courses(current_user):
+    """Create courses from a CSV upload; see import_csv."""
+    result = import_csv(Course, COURSE_IMPORT_COLUMNS, {'department_id': 'department', 'lecture_id': 'user'}, current_user.id)
+    if result[1] == 201:
+        invalidate_references('course')
+    return result
+
+@api.route('/api/courses', methods=['GET'])
+@token_required
+@conditional_get(Course)
+def get_courses(current_user):
+    """Get courses, paginated by id. Filter with department_id."""
+    criteria = []
+    if 'department_id' in request.args:
+        department_id = request.args.get('department_id', type=int)
+        if department_id is None:
+            return jsonify({'error': 'Invalid department_id'}), 400
+        criteria.append(Course.department_id == department_id)
+    return list_page(COURSE_FIELDS, *criteria)
+
+@api.route('/api/courses/<int:course_id>', methods=['GET'])
+@token_required
+def get_course(current_user, course_id):
+    """Get a specific course by ID."""
+    course = Course.query.get(course_id)
+    if not course:
+        return jsonify({'error': 'Course not found'}), 404
+    return jsonify(serialize(COURSE_FIELDS, course)), 200
+
+@api.route('/api/courses/<int:course_id>', methods=['PUT'])
+@token_required
+def update_course(current_user, course_id):
+    """Update a course."""
+    course = Course.query.get(course_id)
+    if not course:
+        return jsonify({'error': 'Course not found'}), 404
+    data = request.get_json()
+    if 'course_name' in data:
+        course.course_name = data['course_name']
+    if 'department_id' in data:
+        if not reference_exists('department', data['department_id']):
+            return jsonify({'error': 'Department not found'}), 404
+        course.department_id = data['department_id']
+    if 'semester' in data:
+        course.semester = data['semester']
+    if 'class_hours' in data:
+        course.class_hours = data['class_hours']
+    if 'lecture_id' in data:
+        if not reference_exists('user', data['lecture_id']):
+            return jsonify({'error': 'Lecture not found'}), 404
+        course.lecture_id = data['lecture_id']
+    course.updated_at = datetime.utcnow()
+    try:
+        db.session.commit()
+        invalidate_references('course')
+        return jsonify({'message': 'Course updated'}), 200
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f'Error updating course: {str(e)}')
+        return jsonify({'error': 'Database error'}), 500
+
+# Student APIs
+@api.route('/api/students', methods=['POST'])
+@token_required
+def create_student(current_user):
+    """Create a new student."""
+    data = request.get_json()
+    required_fields = ['full_name', 'department_id']
+    if not data or not all(key in data for key in required_fields):
+        return jsonify({'error': 'Missing required fields'}), 400
+    if not reference_exists('department', data['department_id']):
+        return jsonify({'error': 'Department not found'}), 404
+    student = Student(
+        full_name=data['full_name'],
+        department_id=data['department_id'],
+        class_=data.get('class'),
+        submitted_by=current_user.id,
+        updated_at=datetime.utcnow()
+    )
+    db.session.add(student)
+    try:
+        db.session.commit()
+        return jsonify(serialize(STUDENT_FIELDS, student)), 201
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f'Error creating student: {str(e)}')
+        return jsonify({'error': 'Database error'}), 500
+
+# CSV columns of /api/students/import: header, Student attribute, type, required
+STUDENT_IMPORT_COLUMNS = [
+    ('full_name', 'full_name', str, True),
+    ('department_id', 'department_id', int, True),
+    ('class', 'class_', str, False)
+]
+
+@api.route('/api/students/import', methods=['POST'])
+@token_required
+def import_students(current_user):
+    """Create students from a CSV upload; see import_csv."""
+    return import_csv(Student, STUDENT_IMPORT_COLUMNS, {'department_id': 'department'}, current_user.id)
+
+@api.route('/api/students', methods=['GET'])
+@token_required
+def get_students(current_user):
+    """Get students, paginated by id. Filter with department_id and class."""
+    criteria = []
+    if 'department_id' in request.args:
+        department_id = request.args.get('department_id', type=int)
+        if department_id is None:
+            return jsonify({'error': 'Invalid department_id'}), 400
+        criteria.append(Student.department_id == department_id)
+    if 'class' in request.args:
+        criteria.append(Student.class_ == request.args['class'])
+    return list_page(STUDENT_FIELDS, *criteria)
+
+@api.route('/api/students/search', methods=['GET'])
+@token_required
+def search_students(current_user):
+    """Find students by name prefix, best matches first."""
+    return search_page(Student, STUDENT_FIELDS)
+
+@api.route('/api/students/<int:student_id>', methods=['GET'])
+@token_required
+@conditional_get(Student, lambda student_id: [Student.id == student_id])
+def get_student(current_user, student_id):
+    """Get a specific student by ID."""
+    student = Student.query.get(student_id)
+    if not student:
+        return jsonify({'error': 'Student not found'}), 404
+    return jsonify(serialize(STUDENT_FIELDS, student)), 200
+
+@api.route('/api/students/<int:student_id>', methods=['PUT'])
+@token_required
+def update_student(current_user, student_id):
+    """Update a student."""
+    student = Student.query.get(student_id)
+    if not student:
+        return jsonify({'error': 'Student not found'}), 404
+    data = request.get_json()
+    if 'full_name' in data:
+        student.full_name = data['full_name']
+    if 'department_id' in data:
+        if not reference_exists('department', data['department_id']):
+            return jsonify({'error': 'Department not found'}), 404
+        student.department_id = data['department_id']
+    if 'class' in data:
+        student.class_ = data['class']
+    student.updated_at = datetime.utcnow()
+    try:
+        db.session.commit()
+        return jsonify({'message': 'Student updated'}), 200
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f'Error updating student: {str(e)}')
+        return jsonify({'error': 'Database error'}), 500
+
+# AttendanceLog APIs
+def validate_attendance_payload(data):
+    """Check a single attendance mark body; return an error response, or None when it is valid."""
+    required_fields = ['student_id', 'course_id', 'present']
+    if not data or not all(key in data for key in required_fields):
+        return jsonify({'error': 'Missing required fields'}), 400
+    if not all(isinstance(data[key], int) and not isinstance(data[key], bool) for key in ('student_id', 'course_id')) \
+            or not isinstance(data['present'], bool):
+        return jsonify({'error': 'student_id and course_id must be integers and present a boolean'}), 400
+    if not db.session.query(Student.id).filter_by(id=data['student_id']).first():
+        return jsonify({'error': 'Student not found'}), 404
+    if not reference_exists('course', data['course_id']):
+        return jsonify({'error': 'Course not found'}), 404
+    return None
+
+@api.route('/api/attendance', methods=['POST'])
+@token_required
+def mark_attendance(current_user):
+    """Mark attendance for a student in a course."""
+    data = request.get_json()
+    error = validate_attendance_payload(data)
+    if error:
+        return error
+    now = datetime.utcnow()
+    attendance = AttendanceLog(
+        student_id=data['student_id'],
+        course_id=data['course_id'],
+        present=data['present'],
+        attendance_date=now.date(),
+        submitted_by=current_user.id,
+        updated_at=now
+    )
+    db.session.add(attendance)
+    try:
+        db.session.flush()
+        bump_rollups([attendance])
+        db.session.commit()
+        return jsonify(serialize(ATTENDANCE_FIELDS, attendance)), 201
+    except IntegrityError:
+        # The unique (student_id, course_id, attendance_date) index rejects a second mark
+        db.session.rollback()
+        return jsonify({'error': 'Attendance already marked today'}), 400
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f'Error marking attendance: {str(e)}')
+        return jsonify({'error': 'Database error'}), 500
+
+@api.route('/api/attendance/batch', methods=['POST'])
+@token_required
+def mark_attendance_batch(current_user):
+    """Mark attendance for a whole class roster of one course in a single transaction."""
+    data = request.get_json()
+    if not data or 'course_id' not in data or not isinstance(data.get('entries'), list):
+        return jsonify({'error': 'Missing required fields'}), 400
+    if len(data['entries']) > current_app.config['ATTENDANCE_BATCH_LIMIT']:
+        return jsonify({'error': f"Too many entries, limit is {current_app.config['ATTENDANCE_BATCH_LIMIT']}"}), 400
+    if not isinstance(data['course_id'], int) or isinstance(data['course_id'], bool):
+        return jsonify({'error': 'course_id must be an integer'}), 400
+    if not reference_exists('course', data['course_id']):
+        return jsonify({'error': 'Course not found'}), 404
+    entries = []
+    for e in data['entries']:
+        if not isinstance(e, dict) or not isinstance(e.get('student_id'), int) \
+                or isinstance(e.get('student_id'), bool) or not isinstance(e.get('present'), bool):
+            return jsonify({'error': 'Each entry needs an integer student_id and a boolean present'}), 400
+        entries.append({
+            'student_id': e['student_id'],
+            'course_id': data['course_id'],
+            'present': e['present'],
+            'submitted_by': current_user.id
+        })
+    try:
+        results = record_attendance(entries)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'Attendance was marked concurrently, retry the batch'}), 409
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f'Error marking batch attendance: {str(e)}')
+        return jsonify({'error': 'Database error'}), 500
+    rows = [r if isinstance(r, dict) else {
+        'student_id': r.student_id,
+        'id': r.id,
+        'present': r.present,
+        'attendance_date': r.attendance_date.isoformat(),
+        'updated_at': r.updated_at.isoformat()
+    } for r in results]
+    created = sum(1 for r in rows if 'error' not in r)
+    return jsonify({
+        'course_id': data['course_id'],
+        'created': created,
+        'failed': len(rows) - created,
+        'results': rows
+    }), 201 if created else 400
+
+class AttendanceIngest:
+    """Bounded in-process queue of attendance events flushed by a background writer.
+
+    The writer thread starts with the first event. It collects up to
+    INGEST_BATCH_SIZE events or waits INGEST_FLUSH_MS, whichever comes first,
+    and writes them with record_attendance in one transaction. stop() drains
+    whatever is queued; it is registered with atexit.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.queue = queue.Queue(maxsize=app.config['INGEST_QUEUE_SIZE'])
+        self.counts = defaultdict(int)
+        self._statuses = OrderedDict()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def submit(self, event):
+        """Queue an event dict; return its id, or None when the queue is full."""
+        self._start()
+        event_id = uuid.uuid4().hex
+        self._set_status(event_id, {'status': 'queued'})
+        try:
+            self.queue.put_nowait((event_id, event))
+        except queue.Full:
+            with self._lock:
+                self._statuses.pop(event_id, None)
+            return None
+        return event_id
+
+    def status(self, event_id):
+        with self._lock:
+            return self._statuses.get(event_id)
+
+    def stop(self, timeout=None):
+        """Stop accepting work once the queue is drained and wait for the writer."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='attendance-ingest', daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def _set_status(self, event_id, status):
+        with self._lock:
+            self._statuses[event_id] = status
+            while len(self._statuses) > self.app.config['INGEST_STATUS_SIZE']:
+                self._statuses.popitem(last=False)
+
+    def _run(self):
+        flush_seconds = self.app.config['INGEST_FLUSH_MS'] / 1000
+        batch_size = self.app.config['INGEST_BATCH_SIZE']
+        while True:
+            try:
+                batch = [self.queue.get(timeout=flush_seconds)]
+            except queue.Empty:
+                if self._stopping.is_set():
+                    return
+                continue
+            deadline = time.monotonic() + flush_seconds
+            while len(batch) < batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch):
+        with self.app.app_context():
+            try:
+                results = record_attendance([event for _, event in batch])
+                db.session.commit()
+            except IntegrityError:
+                # Another writer raced in a row for the same day; fall back to one transaction per event
+                db.session.rollback()
+                results = [self._write_one(event) for _, event in batch]
+            except Exception as e:
+                db.session.rollback()
+                logging.error(f'Error writing attendance events: {str(e)}')
+                results = [{'error': 'Database error', 'failed': True}] * len(batch)
+            for (event_id, _), result in zip(batch, results):
+                if isinstance(result, dict):
+                    status = 'failed' if result.get('failed') else 'rejected'
+                    self._set_status(event_id, {'status': status, 'error': result['error']})
+                else:
+                    status = 'written'
+                    self._set_status(event_id, {'status': status, 'id': result.id})
+                self.counts[status] += 1
+
+    def _write_one(self, event):
+        try:
+            result = record_attendance([event])[0]
+            db.session.commit()
+            return result
+        except IntegrityError:
+            db.session.rollback()
+            return {'error': 'Attendance already marked today'}
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f'Error writing attendance event: {str(e)}')
+            return {'error': 'Database error', 'failed': True}
+
+    def collect_queue_depth(self):
+        return 'app_ingest_queue_depth', 'gauge', 'Attendance events waiting to be written.', {(): self.queue.qsize()}
+
+    def collect_events(self):
+        return ('app_ingest_events_total', 'counter', 'Attendance events processed by outcome.',
+                {(('status', status),): count for status, count in dict(self.counts).items()})
+
+@api.route('/api/attendance/events', methods=['POST'])
+@token_required
+def submit_attendance_event(current_user):
+    """Validate an attendance event and queue it for a group commit; answers 202."""
+    if not current_app.config['INGEST_ENABLED']:
+        return jsonify({'error': 'Ingest mode disabled'}), 404
+    data = request.get_json()
+    error = validate_attendance_payload(data)
+    if error:
+        return error
+    event_id = current_app.extensions['attendance_ingest'].submit({
+        'student_id': data['student_id'],
+        'course_id': data['course_id'],
+        'present': data['present'],
+        'submitted_by': current_user.id
+    })
+    if event_id is None:
+        response = jsonify({'error': 'Ingest queue full, retry later'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    return jsonify({'event_id': event_id, 'status': 'queued'}), 202
+
+@api.route('/api/attendance/events/<event_id>', methods=['GET'])
+@token_required
+def get_attendance_event(current_user, event_id):
+    """Get the status of a queued attendance event: queued, written, rejected or failed."""
+    status = current_app.extensions['attendance_ingest'].status(event_id)
+    if status is None:
+        return jsonify({'error': 'Event not found'}), 404
+    return jsonify(dict(status, event_id=event_id)), 200
+
+def export_columns(log):
+    """Columns of /api/attendance/export, in output order, reading logs from the `log` entity."""
+    return [
+        ('id', log.id),
+        ('attendance_date', log.attendance_date),
+        ('student_id', log.student_id),
+        ('student_name', Student.full_name),
+        ('course_id', log.course_id),
+        ('course_name', Course.course_name),
+        ('present', log.present),
+        ('submitted_by', log.submitted_by),
+        ('updated_at', log.updated_at),
+    ]
+
+@api.route('/api/attendance/export', methods=['GET'])
+@token_required
+def export_attendance(current_user):
+    """Stream attendance logs for a date range as CSV or NDJSON.
+
+    Rows are read with yield_per and student/course names are joined in the
+    same query, so memory stays constant however many rows are exported.
+    """
+    start, end, error = parse_date_range()
+    if error:
+        return error
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({'error': 'Invalid format, use csv or ndjson'}), 400
+    chunk_size = current_app.config['EXPORT_CHUNK_SIZE']
+    log = attendance_source(start)
+    columns = export_columns(log)
+    names = [name for name, _ in columns]
+    query = db.session.query(*(column for _, column in columns)).select_from(log).join(
+        Student, log.student_id == Student.id
+    ).join(
+        Course, log.course_id == Course.id
+    ).filter(
+        log.attendance_date.between(start, end)
+    ).order_by(log.id).yield_per(chunk_size)
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if fmt == 'csv':
+            writer.writerow(names)
+        for count, row in enumerate(query, 1):
+            if fmt == 'csv':
+                writer.writerow([iso_value(v) for v in row])
+            else:
+                buffer.write(json.dumps(dict(zip(names, (iso_value(v) for v in row)))) + '\n')
+            if count % chunk_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    filename = f'attendance_{start.isoformat()}_{end.isoformat()}.{fmt}'
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/csv' if fmt == 'csv' else 'application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+def summary_requested():
+    """Whether an attendance read asks for per-course totals instead of rows."""
+    return request.args.get('summary', '').lower() in ('true', '1')
+
+@api.route('/api/attendance/<int:student_id>', methods=['GET'])
+@token_required
+@conditional_get(AttendanceLog, lambda student_id: [AttendanceLog.student_id == student_id],
+                 lambda student_id: [Course] if summary_requested() else [])
+def get_attendance(current_user, student_id):
+    """Get attendance records for a student, one keyset-paginated page at a time.
+
+    Optional course_id, start_date and end_date narrow the records. With
+    summary=true the response holds per-course present/absent counts and the
+    attendance percentage, aggregated in the database, instead of the rows.
+    Archived terms are read only when start_date is missing or before the
+    archive cutoff.
+    """
+    student = Student.query.get(student_id)
+    if not student:
+        return jsonify({'error': 'Student not found'}), 404
+    course_id = request.args.get('course_id', type=int)
+    if 'course_id' in request.args and course_id is None:
+        return jsonify({'error': 'Invalid course_id'}), 400
+    days = {}
+    for name in ('start_date', 'end_date'):
+        if name in request.args:
+            if not validate_date(request.args[name]):
+                return jsonify({'error': 'Invalid date parameters, use YYYY-MM-DD'}), 400
+            days[name] = datetime.strptime(request.args[name], '%Y-%m-%d').date()
+    if len(days) == 2 and days['start_date'] > days['end_date']:
+        return jsonify({'error': 'Start date must be before end date'}), 400
+    log = attendance_source(days.get('start_date'))
+    criteria = [log.student_id == student_id]
+    if course_id is not None:
+        criteria.append(log.course_id == course_id)
+    if 'start_date' in days:
+        criteria.append(log.attendance_date >= days['start_date'])
+    if 'end_date' in days:
+        criteria.append(log.attendance_date <= days['end_date'])
+    if not summary_requested():
+        return list_page({name: getattr(log, column.key) for name, column in ATTENDANCE_FIELDS.items()}, *criteria)
+    # Served by the (student_id, course_id, attendance_date) index, one row per course
+    present = func.sum(case((log.present, 1), else_=0))
+    rows = db.session.query(
+        log.course_id, Course.course_name, present, func.count()
+    ).select_from(log).join(
+        Course, log.course_id == Course.id
+    ).filter(*criteria).group_by(log.course_id, Course.course_name).order_by(log.course_id).all()
+    count_rows(rows)
+    return jsonify({
+        'student_id': student_id,
+        'courses': [{
+            'course_id': course_id,
+            'course_name': course_name,
+            'present': present,
+            'absent': total - present,
+            'percentage': round(100 * present / total, 1)
+        } for course_id, course_name, present, total in rows]
+    }), 200
+
+# Optional breakdowns for /api/report: group column, extra join target and its join
+# condition given the attendance entity being read
+REPORT_GROUPS = {
+    'course': (Course.course_name, Course, lambda log: log.course_id == Course.id),
+    'department': (Department.department_name, Department, lambda log: Student.department_id == Department.id),
+    'class': (Student.class_, None, None),
+}
+
+@api.route('/api/report', methods=['GET'])
+@token_required
+def get_report(current_user):
+    """Get attendance report for a date range, aggregated in the database.
+
+    Optional group_by=course|department|class nests the per-student totals
+    under each course name, department name or class.
+    """
+    start, end, error = parse_date_range()
+    if error:
+        return error
+    group_by = request.args.get('group_by')
+    if group_by and group_by not in REPORT_GROUPS:
+        return jsonify({'error': f"Invalid group_by, use one of: {', '.join(REPORT_GROUPS)}"}), 400
+    if group_by != 'course' and current_app.config['REPORT_USE_ROLLUP']:
+        # Whole days are pre-aggregated per student; only course breakdowns need the raw logs
+        source, student_column, date_column = DailyAttendance, DailyAttendance.student_id, DailyAttendance.attendance_date
+        totals = [func.sum(DailyAttendance.present_count), func.sum(DailyAttendance.absent_count)]
+    else:
+        # The daily rollup keeps archived days; raw logs need the archive only for ranges reaching into it
+        source = attendance_source(start)
+        student_column, date_column = source.student_id, source.attendance_date
+        totals = [
+            func.sum(case((source.present, 1), else_=0)),
+            func.sum(case((source.present, 0), else_=1))
+        ]
+    columns = [Student.full_name, *totals]
+    group_columns = [student_column]
+    joins = [(Student, student_column == Student.id)]
+    if group_by:
+        group_column, join_target, join_on = REPORT_GROUPS[group_by]
+        if join_target is not None:
+            joins.append((join_target, join_on(source)))
+        columns.insert(0, group_column)
+        group_columns.insert(0, group_column)
+    rows = db.session.query(*columns).select_from(source)
+    for target, on in joins:
+        rows = rows.join(target, on)
+    rows = rows.filter(date_column.between(start, end)).group_by(*group_columns)
+    # Use functional style with reduce over the aggregated rows, one per student
+    def accumulate_report(report, row):
+        *group, name, present, absent = row
+        target = report[group[0]] if group else report
+        target[name]['present'] += present
+        target[name]['absent'] += absent
+        return report
+    new_totals = lambda: defaultdict(lambda: {'present': 0, 'absent': 0})
+    initial_report = defaultdict(new_totals) if group_by else new_totals()
+    report = reduce(accumulate_report, count_rows(rows.all()), initial_report)
+    if group_by:
+        return jsonify({str(key): dict(totals) for key, totals in report.items()}), 200
+    return jsonify(dict(report)), 200
+
+@api.route('/api/report/at-risk', methods=['GET'])
+@token_required
+def get_at_risk(current_user):
+    """List (student, course) pairs whose attendance rate is below `threshold` percent, lowest first.
+
+    Without a date range the all-time totals come from the course_attendance
+    rollup, one row per student and course; start_date/end_date aggregate the
+    logs of that range instead. department_id narrows to one department.
+    """
+    threshold = request.args.get('threshold', current_app.config['AT_RISK_THRESHOLD'], type=float)
+    if threshold is None or not 0 <= threshold <= 100:
+        return jsonify({'error': 'threshold must be a percentage between 0 and 100'}), 400
+    department_id = request.args.get('department_id', type=int)
+    if 'department_id' in request.args and department_id is None:
+        return jsonify({'error': 'Invalid department_id'}), 400
+    if 'start_date' in request.args or 'end_date' in request.args:
+        start, end, error = parse_date_range()
+        if error:
+            return error
+        log = attendance_source(start)
+        counts = select(
+            log.student_id,
+            log.course_id,
+            func.sum(case((log.present, 1), else_=0)).label('present_count'),
+            func.sum(case((log.present, 0), else_=1)).label('absent_count')
+        ).select_from(log).where(
+            log.attendance_date.between(start, end)
+        ).group_by(log.student_id, log.course_id).subquery()
+    else:
+        counts = CourseAttendance.__table__
+    total = counts.c.present_count + counts.c.absent_count
+    rate = counts.c.present_count * 100.0 / total
+    query = select(
+        counts.c.student_id, Student.full_name, counts.c.course_id, Course.course_name,
+        counts.c.present_count, counts.c.absent_count, func.round(rate, 1)
+    ).join(
+        Student, counts.c.student_id == Student.id
+    ).join(
+        Course, counts.c.course_id == Course.id
+    ).where(
+        counts.c.present_count * 100 < threshold * total
+    ).order_by(rate, counts.c.student_id, counts.c.course_id)
+    if department_id is not None:
+        query = query.where(Student.department_id == department_id)
+    names = ['student_id', 'full_name', 'course_id', 'course_name', 'present', 'absent', 'percentage']
+    # Plain Core execution: the rows are tuples, no ORM result processing needed
+    return render_rows(names, db.session.connection().execute(query).all(), threshold=threshold)
+
+def bucket_spans(start, end, bucket):
+    """Return the (first, last) day of each day or ISO week bucket from `start` to `end`, clamped to the range."""
+    spans = []
+    day = start
+    while day <= end:
+        last = day if bucket == 'day' else min(day + timedelta(days=6 - day.weekday()), end)
+        spans.append((day, last))
+        day = last + timedelta(days=1)
+    return spans
+
+@api.route('/api/report/timeseries', methods=['GET'])
+@token_required
+def get_timeseries(current_user):
+    """Get dense per-day or per-week present/absent counts of one course or department.
+
+    Needs course_id or department_id, start_date and end_date; bucket is day
+    (default) or week (ISO weeks, clamped to the range). Days without
+    attendance count as zero. Buckets that ended before today cannot change
+    any more and are cached, so a poll only queries the current bucket.
+    """
+    start, end, error = parse_date_range()
+    if error:
+        return error
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in ('day', 'week'):
+        return jsonify({'error': 'Invalid bucket, use day or week'}), 400
+    scopes = [name for name in ('course_id', 'department_id') if name in request.args]
+    if len(scopes) != 1:
+        return jsonify({'error': 'Pass exactly one of course_id and department_id'}), 400
+    scope = scopes[0]
+    scope_id = request.args.get(scope, type=int)
+    if scope_id is None:
+        return jsonify({'error': f'Invalid {scope}'}), 400
+    kind = scope[:-len('_id')]
+    if not reference_exists(kind, scope_id):
+        return jsonify({'error': f'{kind.capitalize()} not found'}), 404
+    if (end - start).days >= current_app.config['TIMESERIES_MAX_BUCKETS'] * (1 if bucket == 'day' else 7):
+        return jsonify({'error': f"Too many buckets, limit is {current_app.config['TIMESERIES_MAX_BUCKETS']}"}), 400
+    spans = bucket_spans(start, end, bucket)
+    cache = current_app.extensions['timeseries_cache']
+    today = datetime.utcnow().date()
+    totals = {span: cache.get((scope, scope_id, span)) if span[1] < today else None for span in spans}
+    missing = [span for span, value in totals.items() if value is None]
+    if missing:
+        # One grouped query over the days of every bucket not served from the cache
+        first, last = missing[0][0], missing[-1][1]
+        log = attendance_source(first)
+        query = select(
+            log.attendance_date,
+            func.sum(case((log.present, 1), else_=0)),
+            func.sum(case((log.present, 0), else_=1))
+        ).select_from(log).where(log.attendance_date.between(first, last))
+        if scope == 'course_id':
+            query = query.where(log.course_id == scope_id)
+        else:
+            query = query.join(Course, log.course_id == Course.id).where(Course.department_id == scope_id)
+        rows = count_rows(db.session.execute(query.group_by(log.attendance_date)).all())
+        days = {day: (present, absent) for day, present, absent in rows}
+        expires_at = time.time() + current_app.config['TIMESERIES_CACHE_TTL']
+        for span in missing:
+            counts = [days.get(span[0] + timedelta(days=offset), (0, 0)) for offset in range((span[1] - span[0]).days + 1)]
+            totals[span] = (sum(c[0] for c in counts), sum(c[1] for c in counts))
+            if span[1] < today:
+                cache.set((scope, scope_id, span), totals[span], expires_at)
+    return jsonify({
+        scope: scope_id,
+        'bucket': bucket,
+        'buckets': [span[0].isoformat() for span in spans],
+        'present': [totals[span][0] for span in spans],
+        'absent': [totals[span][1] for span in spans]
+    }), 200
+
+class Metrics:
+    """Per-endpoint request latency histograms and SQL totals in Prometheus text format."""
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._statuses = defaultdict(int)
+        # Callables returning extra (name, type, help, {labels tuple: value}) samples
+        self.collectors = []
+
+    def observe(self, endpoint, method, status, seconds, statements, sql_seconds, rows):
+        """Record one finished request."""
+        with self._lock:
+            stats = self._endpoints.get((endpoint, method))
+            if stats is None:
+                stats = self._endpoints[(endpoint, method)] = {
+                    'buckets': [0] * len(self.BUCKETS), 'count': 0, 'sum': 0.0,
+                    'statements': 0, 'sql_seconds': 0.0, 'rows': 0
+                }
+            for i, bound in enumerate(self.BUCKETS):
+                if seconds <= bound:
+                    stats['buckets'][i] += 1
+                    break
+            stats['count'] += 1
+            stats['sum'] += seconds
+            stats['statements'] += statements
+            stats['sql_seconds'] += sql_seconds
+            stats['rows'] += rows
+            self._statuses[(endpoint, method, status)] += 1
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            endpoints = {key: dict(stats, buckets=list(stats['buckets'])) for key, stats in self._endpoints.items()}
+            statuses = dict(self._statuses)
+        lines = [
+            '# HELP app_http_request_duration_seconds Request latency by endpoint.',
+            '# TYPE app_http_request_duration_seconds histogram'
+        ]
+        for (endpoint, method), stats in sorted(endpoints.items()):
+            labels = f'endpoint="{endpoint}",method="{method}"'
+            cumulative = 0
+            for bound, count in zip(self.BUCKETS, stats['buckets']):
+                cumulative += count
+                lines.append(f'app_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'app_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats["count"]}')
+            lines.append(f'app_http_request_duration_seconds_sum{{{labels}}} {stats["sum"]}')
+            lines.append(f'app_http_request_duration_seconds_count{{{labels}}} {stats["count"]}')
+        lines += ['# HELP app_http_requests_total Requests by endpoint and status.', '# TYPE app_http_requests_total counter']
+        for (endpoint, method, status), count in sorted(statuses.items()):
+            lines.append(f'app_http_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+        for name, key, help_text in (
+            ('app_sql_statements_total', 'statements', 'SQL statements executed while serving requests.'),
+            ('app_sql_duration_seconds_total', 'sql_seconds', 'Time spent executing SQL while serving requests.'),
+            ('app_sql_rows_total', 'rows', 'Rows written by DML plus entities and column rows read while serving requests.')
+        ):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            for (endpoint, method), stats in sorted(endpoints.items()):
+                lines.append(f'{name}{{endpoint="{endpoint}",method="{method}"}} {stats[key]}')
+        for collect in self.collectors:
+            name, kind, help_text, samples = collect()
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+            for labels, value in sorted(samples.items()):
+                label_text = ','.join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+def start_request_metrics():
+    """before_request hook: reset the per-request SQL counters."""
+    g.metrics_start = time.perf_counter()
+    g.sql_statements = 0
+    g.sql_seconds = 0.0
+    g.sql_rows = 0
+    g.sql_log = []
+
+def finish_request_metrics(response):
+    """after_request hook: record the request and log it when slow."""
+    if 'metrics_start' not in g:
+        return response
+    elapsed = time.perf_counter() - g.metrics_start
+    endpoint = request.endpoint or 'unmatched'
+    current_app.extensions['metrics'].observe(
+        endpoint, request.method, response.status_code, elapsed, g.sql_statements, g.sql_seconds, g.sql_rows
+    )
+    if elapsed * 1000 >= current_app.config['SLOW_REQUEST_MS']:
+        queries = '\n'.join(f'  {ms:.1f} ms  {statement}' for ms, statement in g.sql_log)
+        logging.warning(
+            f'Slow request {request.method} {request.full_path} -> {response.status_code}: '
+            f'{elapsed * 1000:.1f} ms, {g.sql_statements} SQL statements in {g.sql_seconds * 1000:.1f} ms\n{queries}'
+        )
+    return response
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context.metrics_start = time.perf_counter()
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Engine hook: add a statement's time and row count to the current request."""
+    if not has_request_context() or 'sql_statements' not in g:
+        return
+    elapsed = time.perf_counter() - context.metrics_start
+    g.sql_statements += 1
+    g.sql_seconds += elapsed
+    # Reads are counted as they come back through the session, see count_fetched_rows
+    if cursor.description is None and cursor.rowcount > 0:
+        g.sql_rows += cursor.rowcount
+    if len(g.sql_log) < current_app.config['SLOW_REQUEST_MAX_QUERIES']:
+        g.sql_log.append((elapsed * 1000, ' '.join(statement.split())))
+
+def count_loaded_entity(target, context):
+    """Mapper load hook: count ORM entities loaded per request; lazy loads in a loop show up as N+1 here."""
+    if has_request_context() and 'sql_rows' in g:
+        g.sql_rows += 1
+
+def count_rows(rows):
+    """Add column rows a handler has already fetched to the request's SQL metrics and return them.
+
+    Entities are counted by count_loaded_entity; this covers the projections
+    that skip the ORM load path. Costs nothing when metrics are disabled.
+    """
+    if has_request_context() and 'sql_rows' in g:
+        g.sql_rows += len(rows)
+    return rows
+
+@api.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Expose request and SQL metrics in Prometheus text format."""
+    if not current_app.config['METRICS_ENABLED']:
+        return jsonify({'error': 'Metrics disabled'}), 404
+    token = current_app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return jsonify({'error': 'Invalid token'}), 401
+    return Response(current_app.extensions['metrics'].render(), mimetype='text/plain; version=0.0.4')
+
+def create_app(config=None):
+    """Create the Flask app.
+
+    Configuration is DEFAULT_CONFIG, then ENV_CONFIG environment variables,
+    then `config`. No database I/O happens here; run `flask --app app init-db`
+    (and `create-admin` once) to prepare the database.
+    """
+    app = Flask(__name__)
+    app.config.update(DEFAULT_CONFIG)
+    app.config['SECRET_KEY'] = os.urandom(24).hex()
+    app.config.update({key: os.environ[env] for env, key in ENV_CONFIG.items() if env in os.environ})
+    app.config.update(config or {})
+    profile = STORAGE_PROFILES[app.config['STORAGE_PROFILE']]
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', storage_engine_options(
+        app.config['SQLALCHEMY_DATABASE_URI'], profile
+    ))
+    db.init_app(app)
+    if app.config['FAST_JSON'] and orjson:
+        app.json = FastJSONProvider(app)
+    app.extensions['auth_cache'] = TTLCache(app.config['AUTH_CACHE_SIZE'])
+    app.extensions['timeseries_cache'] = TTLCache(app.config['TIMESERIES_CACHE_SIZE'])
+    app.extensions['metrics'] = Metrics()
+    ingest = app.extensions['attendance_ingest'] = AttendanceIngest(app)
+    references = app.extensions['reference_cache'] = ReferenceCache()
+    app.extensions['metrics'].collectors += [ingest.collect_queue_depth, ingest.collect_events, references.collect]
+    with app.app_context():
+        # Creating the engine doesn't connect; the PRAGMAs run on each new connection
+        if db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect', partial(apply_storage_profile, profile['pragmas']))
+        if app.config['METRICS_ENABLED']:
+            event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+            event.listen(db.engine, 'after_cursor_execute', after_cursor_execute)
+            # Mapper events are global; several apps in one process share a single listener
+            if not event.contains(db.Model, 'load', count_loaded_entity):
+                event.listen(db.Model, 'load', count_loaded_entity, propagate=True)
+    if app.config['METRICS_ENABLED']:
+        app.before_request(start_request_metrics)
+        app.after_request(finish_request_metrics)
+    app.register_blueprint(api)
+    return app
+
+app = create_app()
+
+if __name__ == '__main__':
+    with app.app_context():
+        init_db()
     app.run(debug=True)
\ No newline at end of file
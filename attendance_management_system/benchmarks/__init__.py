@@ -0,0 +1,23 @@
+"""Benchmarks for the attendance API.
+
+Run from the attendance_management_system directory, e.g.
+python -m benchmarks.batch_attendance
+"""
+import os
+import tempfile
+
+from app import create_app, init_db, bootstrap_admin, issue_token
+
+
+def scratch_app(**config):
+    """Create an app on a fresh SQLite file with an admin user.
+
+    Returns (app, admin id, admin token).
+    """
+    db_dir = tempfile.mkdtemp(prefix='attendance-bench-')
+    config.setdefault('SQLALCHEMY_DATABASE_URI', 'sqlite:///' + os.path.join(db_dir, 'bench.db'))
+    app = create_app(config)
+    with app.app_context():
+        init_db()
+        admin, _ = bootstrap_admin()
+        return app, admin.id, issue_token(admin)
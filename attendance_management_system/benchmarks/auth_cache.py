@@ -0,0 +1,55 @@
+"""Measure authenticated request overhead with and without the token_required principal cache."""
+import argparse
+import time
+
+from sqlalchemy import event
+from app import db, Department
+from benchmarks import scratch_app
+
+
+def run(client, token, url, requests, engine):
+    """Return (seconds per request, SQL statements per request) for GET `url`."""
+    statements = [0]
+
+    def count(*args):
+        statements[0] += 1
+
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        start = time.perf_counter()
+        for _ in range(requests):
+            resp = client.get(url, headers={'Authorization': token})
+            assert resp.status_code == 200, resp.get_json()
+        elapsed = time.perf_counter() - start
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+    return elapsed / requests, statements[0] / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+    app, admin_id, token = scratch_app()
+    auth_cache = app.extensions['auth_cache']
+    with app.app_context():
+        dept = Department(department_name='Benchmark', submitted_by=admin_id)
+        db.session.add(dept)
+        db.session.commit()
+        # A bare read endpoint: one SELECT for the department itself
+        url = f'/api/departments/{dept.id}'
+        engine = db.engine
+    client = app.test_client()
+    size = auth_cache.maxsize
+    auth_cache.maxsize = 0
+    auth_cache.clear()
+    uncached = run(client, token, url, args.requests, engine)
+    auth_cache.maxsize = size
+    cached = run(client, token, url, args.requests, engine)
+    print(f'requests:      {args.requests}')
+    print(f'without cache: {uncached[0] * 1e6:8.1f} us/request, {uncached[1]:.2f} SQL statements/request')
+    print(f'with cache:    {cached[0] * 1e6:8.1f} us/request, {cached[1]:.2f} SQL statements/request')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Compare POST /api/attendance (one student per request) with POST /api/attendance/batch."""
+import argparse
+import time
+
+from app import db, Department, Course, Student
+from benchmarks import scratch_app
+
+
+def seed(app, admin_id, students):
+    """Create one department, `students` students and two courses, return (course ids, student ids)."""
+    with app.app_context():
+        dept = Department(department_name='Benchmark', submitted_by=admin_id)
+        db.session.add(dept)
+        db.session.flush()
+        courses = [Course(course_name=f'Course {i}', department_id=dept.id, submitted_by=admin_id) for i in range(2)]
+        people = [Student(full_name=f'Student {i}', department_id=dept.id, submitted_by=admin_id) for i in range(students)]
+        db.session.add_all(courses + people)
+        db.session.commit()
+        return [c.id for c in courses], [s.id for s in people]
+
+
+def run_single(client, token, course_id, student_ids):
+    start = time.perf_counter()
+    for sid in student_ids:
+        resp = client.post('/api/attendance', headers={'Authorization': token},
+                           json={'student_id': sid, 'course_id': course_id, 'present': True})
+        assert resp.status_code == 201, resp.get_json()
+    return time.perf_counter() - start
+
+
+def run_batch(client, token, course_id, student_ids):
+    start = time.perf_counter()
+    resp = client.post('/api/attendance/batch', headers={'Authorization': token},
+                       json={'course_id': course_id,
+                             'entries': [{'student_id': sid, 'present': True} for sid in student_ids]})
+    assert resp.status_code == 201 and resp.get_json()['failed'] == 0, resp.get_json()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--students', type=int, default=300, help='roster size')
+    args = parser.parse_args()
+    app, admin_id, token = scratch_app()
+    (single_course, batch_course), student_ids = seed(app, admin_id, args.students)
+    client = app.test_client()
+    single = run_single(client, token, single_course, student_ids)
+    batch = run_batch(client, token, batch_course, student_ids)
+    print(f'roster size:        {args.students}')
+    print(f'single endpoint:    {single:.3f}s  ({args.students / single:,.0f} rows/s)')
+    print(f'batch endpoint:     {batch:.3f}s  ({args.students / batch:,.0f} rows/s)')
+    print(f'speedup:            {single / batch:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
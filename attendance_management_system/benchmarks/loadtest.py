@@ -0,0 +1,221 @@
+"""Drive the API with a realistic request mix and report per-endpoint latency as JSON.
+
+By default the app runs in-process through the Flask test client on a freshly
+seeded scratch database. With --url it sends HTTP requests to a running server
+whose database was seeded by benchmarks.seed with the same scale options.
+
+python -m benchmarks.loadtest --requests 5000 --workers 4 --output before.json
+"""
+import argparse
+import json
+import random
+import resource
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from datetime import date, timedelta
+
+from benchmarks import scratch_app
+from benchmarks.seed import add_scale_arguments, department_courses, log_days, seed, student_courses
+
+# Relative weight of each operation in the request mix
+MIX = {
+    'GET /api/attendance/<student_id>': 30,
+    'POST /api/attendance': 20,
+    'GET /api/students': 15,
+    'GET /api/courses/<course_id>': 15,
+    'GET /api/report': 10,
+    'GET /api/students/<student_id>': 10,
+}
+
+
+class Workload:
+    """Builds random requests that are valid for a database seeded at `scale`."""
+
+    def __init__(self, scale):
+        self.scale = scale
+        self.courses_by_department = department_courses(scale)
+        self.days = log_days(scale)
+        # Today's marks walk through the enrolments so that each one is new
+        self._marks = self._enrolments()
+        self._marks_lock = threading.Lock()
+        self._names = list(MIX)
+        self._weights = [MIX[name] for name in self._names]
+
+    def _enrolments(self):
+        for student_id in range(1, self.scale.students + 1):
+            for course_id in student_courses(self.scale, student_id, self.courses_by_department):
+                yield student_id, course_id
+
+    def next_request(self, rng):
+        """Return (operation name, method, path, JSON body or None)."""
+        name = rng.choices(self._names, self._weights)[0]
+        student_id = rng.randint(1, self.scale.students)
+        if name == 'GET /api/attendance/<student_id>':
+            return name, 'GET', f'/api/attendance/{student_id}', None
+        if name == 'POST /api/attendance':
+            with self._marks_lock:
+                student_id, course_id = next(self._marks, (student_id, 1))
+            return name, 'POST', '/api/attendance', {'student_id': student_id, 'course_id': course_id, 'present': True}
+        if name == 'GET /api/students':
+            department = rng.randint(1, self.scale.departments)
+            return name, 'GET', f'/api/students?department_id={department}&limit=100', None
+        if name == 'GET /api/courses/<course_id>':
+            return name, 'GET', f'/api/courses/{rng.randint(1, self.scale.courses)}', None
+        if name == 'GET /api/report':
+            end = date.today() - timedelta(days=rng.randint(1, self.days))
+            start = end - timedelta(days=rng.randint(6, 29))
+            return name, 'GET', f'/api/report?start_date={start}&end_date={end}', None
+        return name, 'GET', f'/api/students/{student_id}', None
+
+
+def client_sender(app, token):
+    """Return a send(method, path, body) -> status function using the Flask test client."""
+    local = threading.local()
+
+    def send(method, path, body):
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        return local.client.open(path, method=method, json=body, headers={'Authorization': token}).status_code
+    return send
+
+
+def http_sender(base_url, token):
+    """Return a send(method, path, body) -> status function speaking HTTP to `base_url`."""
+    def send(method, path, body):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(base_url.rstrip('/') + path, data=data, method=method,
+                                     headers={'Authorization': token, 'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(req) as resp:
+                resp.read()
+                return resp.status
+        except urllib.error.HTTPError as e:
+            return e.code
+    return send
+
+
+def login(base_url, username, password):
+    req = urllib.request.Request(base_url.rstrip('/') + '/api/login', method='POST',
+                                 data=json.dumps({'username': username, 'password': password}).encode(),
+                                 headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req) as resp:
+        return json.load(resp)['token']
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def peak_rss_kb(pid=None):
+    """Peak resident set size in KiB of this process, or of `pid` on Linux."""
+    if pid is None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak // 1024 if sys.platform == 'darwin' else peak
+    with open(f'/proc/{pid}/status') as status:
+        for line in status:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1])
+    return None
+
+
+def run(send, workload, requests, workers, seed_value):
+    """Issue `requests` requests from `workers` threads; return (elapsed seconds, samples by operation)."""
+    samples = defaultdict(list)
+    statuses = defaultdict(lambda: defaultdict(int))
+    lock = threading.Lock()
+    remaining = [requests]
+
+    def worker(index):
+        rng = random.Random(seed_value * 1000 + index)
+        while True:
+            with lock:
+                if remaining[0] == 0:
+                    return
+                remaining[0] -= 1
+            name, method, path, body = workload.next_request(rng)
+            start = time.perf_counter()
+            status = send(method, path, body)
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples[name].append(elapsed)
+                statuses[name][str(status)] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start, samples, statuses
+
+
+def summarise(elapsed, samples, statuses):
+    endpoints = {}
+    for name, values in sorted(samples.items()):
+        values.sort()
+        endpoints[name] = {
+            'count': len(values),
+            'throughput_rps': round(len(values) / elapsed, 2),
+            'mean_ms': round(1000 * sum(values) / len(values), 3),
+            'p50_ms': round(1000 * percentile(values, 50), 3),
+            'p95_ms': round(1000 * percentile(values, 95), 3),
+            'p99_ms': round(1000 * percentile(values, 99), 3),
+            'max_ms': round(1000 * values[-1], 3),
+            'status': dict(statuses[name])
+        }
+    total = sum(len(v) for v in samples.values())
+    return {'requests': total, 'elapsed_s': round(elapsed, 3),
+            'throughput_rps': round(total / elapsed, 2), 'endpoints': endpoints}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_scale_arguments(parser)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--url', help='base URL of a running server instead of the in-process test client')
+    parser.add_argument('--token', help='JWT for --url mode')
+    parser.add_argument('--username', default='admin', help='login for --url mode when no --token is given')
+    parser.add_argument('--password', help='password for --username')
+    parser.add_argument('--server-pid', type=int, help='report the peak RSS of this server process (Linux)')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+    workload = Workload(args)
+    if args.url:
+        token = args.token or login(args.url, args.username, args.password)
+        send = http_sender(args.url, token)
+        mode = 'http'
+    else:
+        app, admin_id, token = scratch_app()
+        seed_start = time.perf_counter()
+        seed(app, args, admin_id)
+        seed_seconds = time.perf_counter() - seed_start
+        send = client_sender(app, token)
+        mode = 'client'
+    elapsed, samples, statuses = run(send, workload, args.requests, args.workers, args.seed)
+    report = summarise(elapsed, samples, statuses)
+    report['mode'] = mode
+    report['scale'] = {name: getattr(args, name) for name in
+                       ('departments', 'courses', 'students', 'logs', 'courses_per_student', 'seed')}
+    report['workers'] = args.workers
+    if mode == 'client':
+        report['seed_s'] = round(seed_seconds, 3)
+    report['peak_rss_kb'] = peak_rss_kb(args.server_pid if mode == 'http' else None)
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Measure /api/students/search latency on a scratch database of realistic student names."""
+import argparse
+import random
+import statistics
+import time
+
+from sqlalchemy import event, insert
+from app import db, search_page, Department, Student, STUDENT_FIELDS
+from benchmarks import scratch_app
+
+FIRST_NAMES = [
+    'James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda', 'William', 'Elizabeth',
+    'David', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Charles', 'Karen',
+    'Aarav', 'Priya', 'Vivaan', 'Ananya', 'Arjun', 'Diya', 'Wei', 'Mei', 'Hiroshi', 'Yuki',
+    'Mohammed', 'Fatima', 'Omar', 'Aisha', 'Lucas', 'Sofia', 'Mateo', 'Valentina', 'Noah', 'Emma',
+]
+LAST_NAMES = [
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+    'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin',
+    'Sharma', 'Patel', 'Singh', 'Kumar', 'Natarajan', 'Iyer', 'Chen', 'Wang', 'Tanaka', 'Sato',
+    'Khan', 'Ali', 'Hassan', 'Silva', 'Santos', 'Rossi', 'Müller', 'Schmidt', 'Dubois', 'Novak',
+]
+QUERIES = ['s', 'sm', 'smi', 'priya', 'natara', 'chen wei', 'mül', 'jo ga', 'rodriguez mary', 'xyz']
+
+
+def names(count, rng):
+    """Yield `count` names of one or two first names and a last name."""
+    for _ in range(count):
+        first = rng.sample(FIRST_NAMES, rng.choice((1, 1, 2)))
+        yield ' '.join(first + [rng.choice(LAST_NAMES)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--students', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    app, admin_id, token = scratch_app(METRICS_ENABLED=False)
+    with app.app_context():
+        dept = Department(department_name='Benchmark', submitted_by=admin_id)
+        db.session.add(dept)
+        db.session.flush()
+        db.session.execute(insert(Student), [
+            {'full_name': name, 'department_id': dept.id, 'submitted_by': admin_id} for name in names(args.students, rng)
+        ])
+        db.session.commit()
+        engine = db.engine
+    sql_time = [0.0]
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        context.bench_start = time.perf_counter()
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        sql_time[0] += time.perf_counter() - context.bench_start
+
+    event.listen(engine, 'before_cursor_execute', before)
+    event.listen(engine, 'after_cursor_execute', after)
+    print(f'students: {args.students}')
+    for q in QUERIES:
+        # search_page alone: no routing or token check, just the queries and rendering
+        with app.test_request_context('/api/students/search', query_string={'q': q}):
+            timings = []
+            sql_time[0] = 0.0
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                response, _ = search_page(Student, STUDENT_FIELDS)
+                timings.append(time.perf_counter() - start)
+            found = len(response.get_json()['items'])
+        print(f'q={q!r:18} {statistics.median(timings) * 1e3:7.3f} ms median, '
+              f'{sql_time[0] / args.repeat * 1e3:7.3f} ms of it in SQL, {found} results')
+
+
+if __name__ == '__main__':
+    main()
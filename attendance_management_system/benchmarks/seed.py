@@ -0,0 +1,152 @@
+"""Seed the database with synthetic departments, courses, students and attendance logs.
+
+Everything is derived from the scale parameters and --seed, so the load test
+can recompute valid ids and enrolments without reading them back:
+department d owns every course and student whose id is congruent to d modulo
+the number of departments, and each student takes --courses-per-student of
+their department's courses. Logs go backwards day by day from yesterday,
+leaving today free for attendance marking.
+
+python -m benchmarks.seed --database sqlite:////tmp/attendance.db --students 100000 --logs 20000000
+"""
+import argparse
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app import create_app, db, init_db, bootstrap_admin, rebuild_rollups
+from app import AttendanceLog, Course, Department, Student
+
+# Rows per INSERT executemany; each chunk commits on its own to keep the journal small
+INSERT_CHUNK = 20000
+
+
+def add_scale_arguments(parser):
+    """Add the scale options shared by the seeder and the load test."""
+    parser.add_argument('--departments', type=int, default=10)
+    parser.add_argument('--courses', type=int, default=200)
+    parser.add_argument('--students', type=int, default=5000)
+    parser.add_argument('--logs', type=int, default=200000)
+    parser.add_argument('--courses-per-student', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def department_courses(scale):
+    """Return {department id: [course ids]}."""
+    courses = {d: [] for d in range(1, scale.departments + 1)}
+    for course_id in range(1, scale.courses + 1):
+        courses[(course_id - 1) % scale.departments + 1].append(course_id)
+    return courses
+
+
+def student_courses(scale, student_id, courses_by_department=None):
+    """Return the course ids a student is enrolled in."""
+    courses_by_department = courses_by_department or department_courses(scale)
+    own = courses_by_department[(student_id - 1) % scale.departments + 1]
+    if not own:
+        return []
+    offset = (student_id - 1) // scale.departments
+    return sorted({own[(offset + k) % len(own)] for k in range(min(scale.courses_per_student, len(own)))})
+
+
+def log_days(scale):
+    """Number of past days needed to hold scale.logs rows."""
+    per_day = 0
+    for department, courses in department_courses(scale).items():
+        students = scale.students // scale.departments + (1 if department <= scale.students % scale.departments else 0)
+        per_day += students * min(scale.courses_per_student, len(courses))
+    return max(1, -(-scale.logs // max(1, per_day)))
+
+
+def _insert_chunks(model, rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == INSERT_CHUNK:
+            db.session.execute(insert(model), chunk)
+            db.session.commit()
+            chunk = []
+    if chunk:
+        db.session.execute(insert(model), chunk)
+        db.session.commit()
+
+
+def seed(app, scale, admin_id):
+    """Insert the synthetic data set described by `scale` into an empty database."""
+    rng = random.Random(scale.seed)
+    now = datetime.utcnow()
+    with app.app_context():
+        _insert_chunks(Department, ({
+            'id': d, 'department_name': f'Department {d}', 'submitted_by': admin_id, 'updated_at': now
+        } for d in range(1, scale.departments + 1)))
+        _insert_chunks(Course, ({
+            'id': c,
+            'course_name': f'Course {c}',
+            'department_id': (c - 1) % scale.departments + 1,
+            'semester': 'Fall',
+            'class_hours': 30,
+            'lecture_id': admin_id,
+            'submitted_by': admin_id,
+            'updated_at': now
+        } for c in range(1, scale.courses + 1)))
+        _insert_chunks(Student, ({
+            'id': s,
+            'full_name': f'Student {s}',
+            'department_id': (s - 1) % scale.departments + 1,
+            'class_': f'Year {s % 4 + 1}',
+            'submitted_by': admin_id,
+            'updated_at': now
+        } for s in range(1, scale.students + 1)))
+        courses_by_department = department_courses(scale)
+        enrolments = [student_courses(scale, s, courses_by_department) for s in range(1, scale.students + 1)]
+        # Each student has a steady attendance rate between 55% and 100%
+        rates = [0.55 + 0.45 * rng.random() for _ in range(scale.students)]
+
+        def logs():
+            remaining = scale.logs
+            today = now.date()
+            for offset in range(1, log_days(scale) + 1):
+                day = today - timedelta(days=offset)
+                stamp = datetime.combine(day, datetime.min.time()) + timedelta(hours=9)
+                for index, courses in enumerate(enrolments):
+                    for course_id in courses:
+                        if remaining == 0:
+                            return
+                        remaining -= 1
+                        yield {
+                            'student_id': index + 1,
+                            'course_id': course_id,
+                            'present': rng.random() < rates[index],
+                            'attendance_date': day,
+                            'submitted_by': admin_id,
+                            'updated_at': stamp
+                        }
+
+        _insert_chunks(AttendanceLog, logs())
+        with db.engine.begin() as connection:
+            rebuild_rollups(connection)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', required=True, help='SQLAlchemy URI of an empty database')
+    add_scale_arguments(parser)
+    scale = parser.parse_args()
+    app = create_app({'SQLALCHEMY_DATABASE_URI': scale.database})
+    with app.app_context():
+        init_db()
+        created = bootstrap_admin()
+        if created is None:
+            parser.error('the database already has users, seed an empty one')
+        admin, password = created
+        admin_id = admin.id
+    start = time.perf_counter()
+    seed(app, scale, admin_id)
+    logging.info(f'Seeded in {time.perf_counter() - start:.1f}s; log in as admin / {password}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Measure response size and encode time of the list representations on a large page."""
+import argparse
+import time
+
+from app import create_app, render_rows, orjson, msgpack, COLUMNAR_MIMETYPE, MSGPACK_MIMETYPE, STUDENT_FIELDS
+
+
+def encode(app, accept, names, rows, repeat):
+    """Return (best seconds, bytes) for rendering `rows` with the given Accept header."""
+    best = None
+    with app.test_request_context(headers={'Accept': accept}):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response, _ = render_rows(names, rows, next_cursor=None)
+            body = response.get_data()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+    return best, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    names = list(STUDENT_FIELDS)
+    rows = [(i, f'Student {i}', i % 50 + 1, f'Class {i % 12}') for i in range(1, args.rows + 1)]
+    # No database work happens while rendering, an in-memory URI is enough
+    apps = {'json': create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'FAST_JSON': False})}
+    if orjson:
+        apps['orjson'] = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+    cases = [(f'{encoder} rows', app, 'application/json') for encoder, app in apps.items()]
+    cases += [(f'{encoder} columnar', app, COLUMNAR_MIMETYPE) for encoder, app in apps.items()]
+    if msgpack:
+        cases.append(('msgpack columnar', apps['json'], MSGPACK_MIMETYPE))
+    print(f'rows: {args.rows} ({", ".join(names)})')
+    baseline = None
+    for label, app, accept in cases:
+        seconds, size = encode(app, accept, names, rows, args.repeat)
+        baseline = baseline or (seconds, size)
+        print(f'{label:18} {seconds * 1000:8.1f} ms {size / 1024:10.1f} KiB '
+              f'({seconds / baseline[0]:.2f}x time, {size / baseline[1]:.2f}x bytes)')
+    if not orjson:
+        print('orjson is not installed; skipped the fast JSON encoder')
+    if not msgpack:
+        print('msgpack is not installed; skipped application/msgpack')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Stress SQLite with concurrent attendance writers and report readers under each storage profile.
+
+Each profile runs in its own process so their connection pools and page
+caches don't interfere. Writers mark attendance for distinct (student, course) pairs,
+readers run /api/report; the run reports throughput and failed requests
+(mostly "database is locked") per role.
+"""
+import argparse
+import json
+import logging
+import subprocess
+import sys
+import threading
+import time
+
+from app import db, Department, Course, Student
+from benchmarks import scratch_app
+
+
+def run_profile(args):
+    logging.disable(logging.CRITICAL)
+    app, admin_id, token = scratch_app(STORAGE_PROFILE=args.profile)
+    with app.app_context():
+        dept = Department(department_name='Benchmark', submitted_by=admin_id)
+        db.session.add(dept)
+        db.session.flush()
+        courses = [Course(course_name=f'Course {i}', department_id=dept.id) for i in range(args.courses)]
+        students = [Student(full_name=f'Student {i}', department_id=dept.id) for i in range(args.students)]
+        db.session.add_all(courses + students)
+        db.session.commit()
+        headers = {'Authorization': token}
+        pairs = iter([(s.id, c.id) for c in courses for s in students])
+    pairs_lock = threading.Lock()
+    stop = time.perf_counter() + args.seconds
+    counts = {'writes': 0, 'write_errors': 0, 'reads': 0, 'read_errors': 0}
+    counts_lock = threading.Lock()
+
+    def tally(key, ok):
+        with counts_lock:
+            counts[key if ok else key[:-1] + '_errors'] += 1
+
+    def writer():
+        client = app.test_client()
+        while time.perf_counter() < stop:
+            with pairs_lock:
+                pair = next(pairs, None)
+            if pair is None:
+                return
+            resp = client.post('/api/attendance', headers=headers,
+                               json={'student_id': pair[0], 'course_id': pair[1], 'present': True})
+            tally('writes', resp.status_code == 201)
+
+    def reader():
+        client = app.test_client()
+        today = time.strftime('%Y-%m-%d', time.gmtime())
+        while time.perf_counter() < stop:
+            resp = client.get(f'/api/report?start_date={today}&end_date={today}&group_by=course', headers=headers)
+            tally('reads', resp.status_code == 200)
+
+    threads = [threading.Thread(target=writer) for _ in range(args.writers)]
+    threads += [threading.Thread(target=reader) for _ in range(args.readers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    counts.update(profile=args.profile, seconds=round(elapsed, 2),
+                  writes_per_s=round(counts['writes'] / elapsed, 1),
+                  reads_per_s=round(counts['reads'] / elapsed, 1))
+    print(json.dumps(counts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--profile', help='run a single profile in this process')
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--courses', type=int, default=20)
+    args = parser.parse_args()
+    if args.profile:
+        run_profile(args)
+        return
+    for profile in ('legacy', 'concurrent'):
+        cmd = [sys.executable, '-m', 'benchmarks.sqlite_concurrency', '--profile', profile]
+        for name in ('writers', 'readers', 'seconds', 'students', 'courses'):
+            cmd += [f'--{name}', str(getattr(args, name))]
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        print(result.stdout.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    main()